@@ -0,0 +1,90 @@
+"""
+Throughput and echo latency of the connected variables protocol
+the client talks to EmulatedDevice over a pseudo terminal, in JSON and binary mode
+
+    python connected_variables_bench.py
+"""
+import asyncio
+import time
+
+from connected_variables_client import ConnectedVariablesClient
+from connected_variables_device import EmulatedDevice, open_pty
+
+ROUND_TRIPS = 500
+UPDATES = 5000
+STREAM_TIME = 2.0
+
+
+def stream_xyz(cv):
+    """
+    device side load, a wheel writing x, y, z every loop
+    """
+    if cv.vars["stream"]:
+        with cv.batch():
+            cv.write("x", cv.vars["x"] + 1)
+            cv.write("y", cv.vars["y"] - 1)
+            cv.write("z", cv.vars["z"] + 0.5)
+
+
+async def bench(binary):
+    master, slave = open_pty()
+    device = EmulatedDevice(slave, step=stream_xyz)
+    device.cv.define("a", 0)
+    device.cv.define("stream", False)
+    device.cv.define("x", 0)
+    device.cv.define("y", 0)
+    device.cv.define("z", 0.0)
+    device.start()
+    client = ConnectedVariablesClient(master)
+    await client.start()
+    await client.synced()
+    await client.set_mode(binary)
+    mode = "binary" if binary else "json"
+
+    # round trip, one update at a time
+    for i in range(ROUND_TRIPS):
+        await client.set("a", i)
+    stats = client.latency_stats()
+    print(
+        mode,
+        "echo latency ms: median",
+        round(stats["median"] * 1000, 3),
+        "p99",
+        round(stats["p99"] * 1000, 3),
+        "max",
+        round(stats["max"] * 1000, 3),
+    )
+
+    # host to device, no wait until the last echo
+    start = time.monotonic()
+    for i in range(UPDATES - 1):
+        client.send({"a": i})
+    await client.set("a", UPDATES)
+    duration = time.monotonic() - start
+    print(mode, "host to device:", round(UPDATES / duration), "updates/s")
+
+    # device to host
+    changes = client.subscribe(["x", "y", "z"])
+    await client.set("stream", True)
+    count = 0
+    start = time.monotonic()
+    while time.monotonic() - start < STREAM_TIME:
+        try:
+            await asyncio.wait_for(changes.get(), STREAM_TIME)
+        except asyncio.TimeoutError:
+            break
+        count += 1
+    duration = time.monotonic() - start
+    await client.set("stream", False)
+    print(mode, "device to host:", round(count / duration), "updates/s")
+
+    client.close()
+    device.stop()
+
+
+async def main():
+    for binary in (False, True):
+        await bench(binary)
+
+
+asyncio.run(main())
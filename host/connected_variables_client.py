@@ -0,0 +1,245 @@
+"""
+asyncio client of the connected variables protocol
+talks to the board over a serial port, or to EmulatedDevice over a pseudo terminal
+
+    client = ConnectedVariablesClient.open_serial("/dev/ttyACM0")
+    await client.start()
+    await client.synced()
+    print(client["a"])
+    latency = await client.set("a", 2)
+    changes = client.subscribe(["a"])
+    name, value = await changes.get()
+
+posix only, the file descriptor is watched by the event loop
+"""
+import asyncio
+import codecs
+import os
+import struct
+import time
+from collections import deque
+
+from connected_variables_host import (
+    ConnectedVariablesDecoder,
+    encode_mode,
+    encode_update,
+)
+
+LATENCY_HISTORY = 1000
+
+
+def float32(value):
+    """
+    value as sent in a binary frame
+    """
+    return struct.unpack("<f", struct.pack("<f", value))[0]
+
+
+def is_echo(expected, value):
+    if expected == value:
+        return True
+    # floats come back in float32 in binary mode
+    if type(expected) is float and type(value) is float:
+        try:
+            return float32(expected) == value
+        except OverflowError:
+            return False
+    return False
+
+
+class ConnectedVariablesClient:
+    """
+    the device variables as an async key value store
+    self.vars holds the last known values, updated as frames arrive
+    on_text: called with anything the device prints outside of frames
+    """
+
+    def __init__(self, fd, on_text=None):
+        self.fd = fd
+        self.on_text = on_text
+        self.port = None  # keeps a pyserial port open
+        self.decoder = ConnectedVariablesDecoder()
+        self.utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        # writes never block, the device may be waiting for us to read
+        self.tx = bytearray()
+        self.writing = False
+        self.subscriptions = []  # (names or None, queue)
+        self.waiting = {}  # name: deque of (future, send time, expected echo)
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+        self.frames = 0
+        self.updates = 0
+        self.first_frame = None
+
+    @classmethod
+    def open_serial(cls, port, baudrate=115200, on_text=None):
+        """
+        client on a serial port, needs pyserial
+        """
+        import serial
+
+        port = serial.Serial(port, baudrate, timeout=0)
+        client = cls(port.fileno(), on_text=on_text)
+        client.port = port
+        return client
+
+    @property
+    def vars(self):
+        return self.decoder.vars
+
+    def __getitem__(self, name):
+        return self.decoder.vars[name]
+
+    def get(self, name, default=None):
+        return self.decoder.vars.get(name, default)
+
+    async def start(self):
+        os.set_blocking(self.fd, False)
+        self.first_frame = asyncio.get_running_loop().create_future()
+        asyncio.get_running_loop().add_reader(self.fd, self.receive)
+
+    def close(self):
+        loop = asyncio.get_running_loop()
+        loop.remove_reader(self.fd)
+        if self.writing:
+            loop.remove_writer(self.fd)
+            self.writing = False
+        if self.port is not None:
+            self.port.close()
+            self.port = None
+
+    async def synced(self):
+        """
+        wait for the first frame with variables
+        """
+        await self.first_frame
+
+    def send(self, updates):
+        """
+        send updates without waiting for the echo
+        """
+        self.write(encode_update(updates).encode())
+
+    async def update(self, updates, timeout=None):
+        """
+        send updates and wait for the device to echo all of them
+        an echo is the first frame after the send with the value
+        as the device stores it, cast to the variable type
+        timeout: seconds, asyncio.TimeoutError after it,
+            e.g. when the device rejects a value
+        returns the round trip time in seconds
+        """
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        futures = {}
+        for name, value in updates.items():
+            future = loop.create_future()
+            expected = self.expected_echo(name, value)
+            self.waiting.setdefault(name, deque()).append((future, start, expected))
+            futures[name] = future
+        self.send(updates)
+        try:
+            await asyncio.wait_for(asyncio.gather(*futures.values()), timeout)
+        except asyncio.TimeoutError:
+            for name, future in futures.items():
+                self.waiting[name] = deque(
+                    [w for w in self.waiting[name] if w[0] is not future]
+                )
+            raise
+        latency = time.monotonic() - start
+        self.latencies.append(latency)
+        return latency
+
+    async def set(self, name, value, timeout=None):
+        return await self.update({name: value}, timeout)
+
+    def expected_echo(self, name, value):
+        """
+        value cast like the device does, to the type of the variable
+        """
+        if name not in self.vars:
+            return value
+        try:
+            return type(self.vars[name])(value)
+        except (ValueError, TypeError, OverflowError):
+            # rejected by the device, only a timeout ends the wait
+            return value
+
+    async def set_mode(self, binary):
+        """
+        switch the device between JSON and binary frames
+        """
+        self.write(encode_mode(binary).encode())
+
+    def write(self, data):
+        self.tx.extend(data)
+        if not self.writing:
+            self.transmit()
+
+    def transmit(self):
+        try:
+            n = os.write(self.fd, self.tx)
+        except BlockingIOError:
+            n = 0
+        del self.tx[:n]
+        # wait for the device to read before writing the rest
+        if self.tx and not self.writing:
+            asyncio.get_running_loop().add_writer(self.fd, self.transmit)
+            self.writing = True
+        elif not self.tx and self.writing:
+            asyncio.get_running_loop().remove_writer(self.fd)
+            self.writing = False
+
+    def subscribe(self, names=None):
+        """
+        queue of (name, value) for every update of the given variables
+        all variables when names is None
+        """
+        queue = asyncio.Queue()
+        self.subscriptions.append((names, queue))
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscriptions = [s for s in self.subscriptions if s[1] is not queue]
+
+    def latency_stats(self):
+        """
+        min, median, 99th percentile and max of the round trips, in seconds
+        """
+        if not self.latencies:
+            return None
+        values = sorted(self.latencies)
+        n = len(values)
+        return {
+            "min": values[0],
+            "median": values[n // 2],
+            "p99": values[min(n - 1, n * 99 // 100)],
+            "max": values[-1],
+        }
+
+    def receive(self):
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        for kind, payload in self.decoder.feed(self.utf8.decode(data)):
+            if kind == "text":
+                if self.on_text is not None:
+                    self.on_text(payload)
+            elif kind != "schema":
+                self.dispatch(kind, payload)
+
+    def dispatch(self, kind, updates):
+        self.frames += 1
+        self.updates += len(updates)
+        if updates and not self.first_frame.done():
+            self.first_frame.set_result(None)
+        for name, value in updates.items():
+            # echoes come as json or delta frames, a snapshot may be older
+            waiting = self.waiting.get(name)
+            if kind != "full" and waiting and is_echo(waiting[0][2], value):
+                future, start, expected = waiting.popleft()
+                if not future.done():
+                    future.set_result(time.monotonic() - start)
+            for names, queue in self.subscriptions:
+                if names is None or name in names:
+                    queue.put_nowait((name, value))
@@ -0,0 +1,89 @@
+"""
+Device side of the connected variables protocol emulated with CPython
+runs src/lib/connected_variables.py in a thread, on one end of a pseudo terminal
+
+    master, slave = open_pty()
+    device = EmulatedDevice(slave)
+    device.cv.define("a", 1)
+    device.start()
+    # the host talks to master, see connected_variables_client.py
+"""
+import array
+import fcntl
+import os
+import sys
+import termios
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "lib"))
+from connected_variables import ConnectedVariables
+from connected_variables_host import write_all
+
+
+def open_pty():
+    """
+    a loopback pair, what is written on one end is read on the other
+    raw mode, so there is no echo and no line buffering
+    """
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    return master, slave
+
+
+class FdSerial:
+    """
+    usb_cdc.Serial like stream on a file descriptor
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.size = array.array("i", [0])
+
+    @property
+    def in_waiting(self):
+        fcntl.ioctl(self.fd, termios.FIONREAD, self.size)
+        return self.size[0]
+
+    def readinto(self, buffer):
+        data = os.read(self.fd, len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class EmulatedDevice:
+    """
+    ConnectedVariables and its main loop on a file descriptor
+    step: called every loop with the ConnectedVariables, like the board code
+    """
+
+    def __init__(self, fd, step=None, period=0.0):
+        self.fd = fd
+        self.step = step
+        self.period = period
+        self.cv = ConnectedVariables(serial=FdSerial(fd), output=self.output)
+        self.running = False
+        self.thread = None
+
+    def output(self, text):
+        write_all(self.fd, text.encode())
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while self.running:
+            self.cv.serial_read()
+            if self.step is not None:
+                self.step(self.cv)
+            self.cv.heart_beat()
+            time.sleep(self.period)
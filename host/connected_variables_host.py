@@ -0,0 +1,141 @@
+"""
+Host side of the connected variables protocol
+runs on the computer with CPython, see src/lib/connected_variables.py
+
+Device output is a text stream with frames mixed into normal prints
+- <CV>{json}</CV>: variable updates in JSON mode, and echoes
+- <CVS>[[name, type code], ...]</CVS>: schema, sent when entering binary mode
+    and again when an int variable gets a value beyond int32 and turns to JSON
+- <CVB>base64</CVB>: full snapshot or changed variables in binary mode
+Heartbeats only carry changed variables, with a full snapshot from time to time,
+an empty frame is a keepalive
+lists and dicts changed in place on the device are found by comparing their JSON
+and sent with the next heartbeat
+
+Host input frames are always JSON: <CV>{json}</CV>
+"""
+import base64
+import json
+import os
+import struct
+
+CV_JSON_START = "<CV>"
+CV_JSON_END = "</CV>"
+CV_BINARY_START = "<CVB>"
+CV_BINARY_END = "</CVB>"
+CV_SCHEMA_START = "<CVS>"
+CV_SCHEMA_END = "</CVS>"
+MODE_KEY = "__mode__"
+
+FRAMES = [
+    (CV_BINARY_START, CV_BINARY_END),
+    (CV_SCHEMA_START, CV_SCHEMA_END),
+    (CV_JSON_START, CV_JSON_END),
+]
+
+
+def write_all(fd, data):
+    """
+    write bytes to a file descriptor, os.write may write only a part
+    """
+    while data:
+        data = data[os.write(fd, data) :]
+
+
+def encode_update(updates):
+    """
+    frame to send variable updates to the device
+    """
+    return CV_JSON_START + json.dumps(updates) + CV_JSON_END
+
+
+def encode_mode(binary):
+    """
+    frame to switch the device between JSON and binary mode
+    """
+    return encode_update({MODE_KEY: "binary" if binary else "json"})
+
+
+class ConnectedVariablesDecoder:
+    """
+    Decode the device output stream
+    feed() text as it arrives, it returns (kind, data) tuples
+    - ("json", updates dict)
+    - ("full", updates dict), a snapshot of all variables
+    - ("delta", updates dict), the changed variables
+    - ("schema", [[name, type code], ...])
+    - ("text", str), anything printed outside of frames
+    self.vars holds the last known value of every variable
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.names = []
+        self.codes = []
+        self.vars = {}
+
+    def feed(self, text):
+        self.buffer += text
+        out = []
+        while True:
+            # earliest frame start
+            first = None
+            for start, end in FRAMES:
+                i = self.buffer.find(start)
+                if i >= 0 and (first is None or i < first[0]):
+                    first = (i, start, end)
+            if first is None:
+                # keep a possible partial start tag
+                keep = self.buffer.rfind("<")
+                if keep < 0:
+                    keep = len(self.buffer)
+                self.text(out, self.buffer[:keep])
+                self.buffer = self.buffer[keep:]
+                return out
+            i, start, end = first
+            j = self.buffer.find(end, i + len(start))
+            if j < 0:
+                self.text(out, self.buffer[:i])
+                self.buffer = self.buffer[i:]
+                return out
+            self.text(out, self.buffer[:i])
+            payload = self.buffer[i + len(start) : j]
+            self.buffer = self.buffer[j + len(end) :]
+            out.append(self.decode(start, payload))
+
+    @staticmethod
+    def text(out, text):
+        if text:
+            out.append(("text", text))
+
+    def decode(self, start, payload):
+        if start == CV_JSON_START:
+            updates = json.loads(payload)
+            self.vars.update(updates)
+            return "json", updates
+        if start == CV_SCHEMA_START:
+            schema = json.loads(payload)
+            self.names = [name for name, code in schema]
+            self.codes = [code for name, code in schema]
+            return "schema", schema
+        return self.decode_binary(base64.b64decode(payload))
+
+    def decode_binary(self, payload):
+        kind = "full" if payload[:1] == b"F" else "delta"
+        updates = {}
+        i = 1
+        while i < len(payload):
+            var_id = payload[i]
+            code = self.codes[var_id]
+            i += 1
+            if code in "sj":
+                (size,) = struct.unpack_from("<H", payload, i)
+                data = payload[i + 2 : i + 2 + size].decode()
+                value = data if code == "s" else json.loads(data)
+                i += 2 + size
+            else:
+                (value,) = struct.unpack_from("<" + code, payload, i)
+                i += struct.calcsize("<" + code)
+            updates[self.names[var_id]] = value
+        self.vars.update(updates)
+        return kind, updates
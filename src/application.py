@@ -16,11 +16,14 @@ from adafruit_hid.keycode import Keycode
 
 # Keeper
 from timetrigger import Timer
+from driver import CLICK, ENTER
 
 class Application:
     """
     Abstract class of UI Applications
     """
+    # tone pattern requested by update() or receive(), played by display()
+    tone = None
     def update(self, event):
         """ update related to main logic, once every frame
         """
@@ -31,13 +34,15 @@ class Application:
     def receive(self, message, memo):
         """ process received message and initialize states """
         raise NotImplementedError
+    def sound(self, buzzer):
+        """ start the requested tone, the buzzer times it """
+        if self.tone is not None:
+            buzzer.play(self.tone)
+            self.tone = None
 
 class MasterKey(Application):
     """ App for typing master key on the clickwheel """
     def __init__(self):
-        # buzzer
-        self.freq = 0
-
         # display setting
         self.scale = 2
 
@@ -85,7 +90,7 @@ class MasterKey(Application):
         # typing is muted to protect the key
         if event.name == "press":
             if event.val == "center":
-                self.freq = 1000
+                self.tone = CLICK
 
         # logic
         if event.name == "release":
@@ -129,12 +134,11 @@ class MasterKey(Application):
         self.cursor_disp.x = 6 * self.scale * (len(self.all_text.text) - 1)
         self.cursor_text.anchored_position = (self.cursor_disp.x, 32)
         # buzzer
-        buzzer.beep(freq=self.freq)
-        self.freq = 0
+        self.sound(buzzer)
         return
 
     def receive(self, message, memo):
-        self.freq = 1200
+        self.tone = ENTER
         print('Entered the Master Key app')
         # init key when entering
         self.key = '0'
@@ -145,10 +149,6 @@ class Menu(Application):
         # data
         self.items = items
 
-        # buzzer
-        self.freq = 0
-        self.tictoc = True
-
         # display
         self.screen_N = min(len(self.items), 4)
         self.splash = displayio.Group()
@@ -199,15 +199,23 @@ class Menu(Application):
         # states
         self.ind = 0
         self.ind_screen = 0
+        self.scroll = 0 # fraction of item from smooth scroll
 
     def update(self, event):
         # buzzer when press or slide
         if event.name in ['dial', 'press']:
-            self.freq = 1000
+            self.tone = CLICK
 
         # logic
         if event.name == 'dial':
             self.ind += event.val
+        if event.name == 'scroll':
+            self.scroll += event.val
+            step = int(self.scroll)
+            if step:
+                self.ind += step
+                self.scroll -= step
+                self.tone = CLICK
         if self.ind - self.ind_screen >= self.screen_N:
             self.ind_screen = self.ind - (self.screen_N - 1)
         if self.ind < self.ind_screen:
@@ -246,18 +254,13 @@ class Menu(Application):
         ))
 
         # buzzer
-        if self.tictoc:
-            buzzer.beep(freq=self.freq)
-            self.freq = 0
-        else:
-            buzzer.beep(freq=0)
-        self.tictoc = not self.tictoc
+        self.sound(buzzer)
 
         return
 
     def receive(self, message, memo):
         print('Entered a Menu app')
-        self.freq = 1200
+        self.tone = ENTER
 
 class AccountList(Menu):
     def __init__(self):
@@ -307,7 +310,7 @@ class AccountList(Menu):
     def receive(self, message, memo):
         super().receive(message, memo)
         print("Entered the Account list")
-        self.freq = 1200
+        self.tone = ENTER
 
 # functions for items
 def ascii_mod(n):
@@ -380,7 +383,7 @@ class Item(Application):
         # buzzer
         if event.name == 'press':
             # if press
-            self.freq = 1000
+            self.tone = CLICK
 
         # logic
         if event.name == 'release':
@@ -413,14 +416,13 @@ class Item(Application):
         if note != self.note_text.text:
             self.note_text.text = note
         # buzzer
-        buzzer.beep(freq=self.freq)
-        self.freq = 0
+        self.sound(buzzer)
         return
 
     def receive(self, message, memo):
         print("Entered the Item app")
         self.after_name = False
-        self.freq = 1200
+        self.tone = ENTER
         self.data = message['data']
         self.key = memo['key']
         return
@@ -2,6 +2,7 @@
 This script contains all classes for
 Background processes
 """
+from time import monotonic, monotonic_ns
 from timetrigger import Repeat
 from adafruit_hid.keycode import Keycode
 
@@ -19,6 +20,11 @@ class Background_app:
         self.repeat_timer = Repeat(self.freq)
     def procedure(self):
         return 0
+    def remaining(self):
+        """
+        seconds until the next procedure, None when stopped
+        """
+        return self.repeat_timer.remaining()
     def __call__(self):
         if self.repeat_timer.check():
             return self.procedure()
@@ -36,6 +42,95 @@ class FpsControl(Background_app):
         self.fps_now = self.repeat_timer.freq_measure
         return 1
 
+# modes of AdaptiveFps
+IDLE = 0
+NORMAL = 1
+BOOST = 2
+MODE_NAMES = ('idle', 'normal', 'boost')
+
+class AdaptiveFps(FpsControl):
+    """
+    Control the frame rate from the use of the wheel
+    - boost_fps while the wheel is touched
+    - fps until idle_time after the last touch or event
+    - idle_fps after that, idle frames only read touch_z()
+        and are not frames for the app, so the display is not refreshed
+    call update() every frame with the state of any and the event
+    wheel: TouchWheelPhysics
+    """
+    def __init__(self, wheel, fps=30, boost_fps=60, idle_fps=4, idle_time=30, thr_z=0.9):
+        super().__init__(fps=fps)
+        self.wheel = wheel
+        self.rates = (idle_fps, fps, boost_fps)
+        self.idle_time = idle_time
+        self.thr_z = thr_z
+        self.mode = NORMAL
+        self.active_time = monotonic()
+        self.mode_start = self.active_time
+        self.idle_check = self.active_time
+        self.mode_time = [0, 0, 0]  # seconds in each mode
+        self.wakeups = 0
+        self.wake_latency_sum = 0
+        self.wake_latency_max = 0
+
+    def set_mode(self, mode):
+        if mode == self.mode:
+            return
+        now = monotonic()
+        self.mode_time[self.mode] += now - self.mode_start
+        self.mode_start = now
+        self.mode = mode
+        # the new period starts from now
+        self.repeat_timer.freq_set = self.rates[mode]
+        self.repeat_timer.timer.start(1 / self.rates[mode])
+
+    def procedure(self):
+        self.fps_now = self.repeat_timer.freq_measure
+        if self.mode != IDLE:
+            return 1
+        now = monotonic()
+        if self.wheel.touch_z() <= self.thr_z:
+            self.idle_check = now
+            return 0
+        # wake up, the touch started after the last idle check
+        latency = now - self.idle_check
+        self.wakeups += 1
+        self.wake_latency_sum += latency
+        self.wake_latency_max = max(self.wake_latency_max, latency)
+        self.active_time = now
+        self.set_mode(BOOST)
+        return 1
+
+    def update(self, touched, event=None):
+        now = monotonic()
+        if touched:
+            self.active_time = now
+            self.set_mode(BOOST)
+        elif event is not None:
+            self.active_time = now
+            self.set_mode(NORMAL)
+        elif now - self.active_time > self.idle_time:
+            self.idle_check = now
+            self.set_mode(IDLE)
+        else:
+            self.set_mode(NORMAL)
+
+    def stats(self):
+        """
+        seconds in each mode, wake ups from idle
+        wake latency is from the idle check before the touch, an upper bound
+        """
+        time_in = list(self.mode_time)
+        time_in[self.mode] += monotonic() - self.mode_start
+        out = {MODE_NAMES[i]: time_in[i] for i in range(3)}
+        out['mode'] = MODE_NAMES[self.mode]
+        out['wakeups'] = self.wakeups
+        out['wake_latency_mean'] = (
+            self.wake_latency_sum / self.wakeups if self.wakeups else 0
+        )
+        out['wake_latency_max'] = self.wake_latency_max
+        return out
+
 class FpsMonitor(Background_app):
     """
     print the current FPS to serial
@@ -51,34 +146,70 @@ class FpsMonitor(Background_app):
 class NumLocker(Background_app):
     """
     Keep the number lock on
+    acts only when the LED report changes,
+    the check period doubles up to max_period while the LEDs are stable
+    NumLock is sent once, then the LED report is given timeout seconds
+    to turn on before the next try
     Should not be used on Mac
-        Will detect Mac and stop
+        a host ignoring NumLock is detected once and left alone
+    keyboard: adafruit_hid Keyboard or the keyboard of a HidQueue,
+        nothing is checked until the queued keyboard is ready
     """
-    def __init__(self, keyboard):
-        super().__init__(period=0.01)
+    def __init__(self, keyboard, min_period=0.05, max_period=2, tries=3, timeout=1):
+        super().__init__(period=min_period)
         self.keyboard = keyboard
-        self.key = 'key'
-        self.counter = 0
+        self.min_period = min_period
+        self.max_period = max_period
+        self.period = min_period
+        self.tries = tries
+        self.timeout = timeout
+        self.last_status = -1
+        self.waiting = False  # NumLock sent, the LED has not turned on yet
+        self.send_time = 0
+        self.sent = 0  # tries without the LED turning on
         self.is_win = True
 
+    def set_period(self, period):
+        self.period = period
+        self.repeat_timer.freq_set = 1 / period
+
     def procedure(self):
-        ## keep number lock
-        if self.is_win:
-            if not int.from_bytes(self.keyboard.led_status, "big") & 1:
-                # if NumLock LED on
-                self.keyboard.send(Keycode.KEYPAD_NUMLOCK)
-                if not int.from_bytes(self.keyboard.led_status, "big") & 1:
-                    # if key dose not have any effect
-                    # Either NumLock is being hold
-                    # or Mac
-                    self.counter += 1
-                    if self.counter > 50:
-                        # If number raise up fastly
-                        # Confirmed Mac
-                        self.is_win = False
-                        print('Mac detected')
-                else:
-                    self.counter = 0
+        if not getattr(self.keyboard, 'ready', True):
+            # USB is not up or the last NumLock is still queued,
+            # the LED report tells nothing, the wait starts once it is sent
+            self.send_time = monotonic()
+            return 0
+        status = self.keyboard.led_status[0]
+        changed = status != self.last_status
+        self.last_status = status
+        if status & 1:
+            # NumLock LED on
+            self.sent = 0
+            self.waiting = False
+            if changed:
+                self.set_period(self.min_period)
+            elif self.period < self.max_period:
+                # stable, check less often
+                self.set_period(min(2 * self.period, self.max_period))
+            return 0
+        if self.waiting:
+            if monotonic() - self.send_time < self.timeout:
+                # the host has not answered yet
+                return 0
+            self.waiting = False
+            self.sent += 1
+        if self.sent >= self.tries:
+            # the key does not have any effect
+            # Either NumLock is being hold
+            # or Mac
+            self.is_win = False
+            self.repeat_timer.timer.disable()
+            print('Mac detected')
+            return 0
+        self.keyboard.send(Keycode.KEYPAD_NUMLOCK)
+        self.waiting = True
+        self.send_time = monotonic()
+        self.set_period(self.min_period)
         return 0
 
 class MouseJitter(Background_app):
@@ -97,3 +228,113 @@ class MouseJitter(Background_app):
         self.mouse.move(0, -10, 0)
         self.mouse.move(-10, 0, 0)
         return 0
+
+class BackgroundRegistry:
+    """
+    Run background apps from one dispatcher
+    and account for the time of their procedures
+
+    background = BackgroundRegistry()
+    background.add(mouse_app)
+    while True:
+        background()  # all added apps
+        if not background.run(frame_app):  # one app, returns its output
+            continue
+    """
+    def __init__(self):
+        self.apps = []  # run by __call__
+        self.index = {}  # id(app): slot of the stats
+        self.names = []
+        self.checks = []  # calls of the app
+        self.runs = []  # procedures run
+        self.time_ns = []  # in procedures
+        self.max_ns = []
+        self.start_ns = monotonic_ns()
+
+    def add(self, app, name=None, auto=True):
+        """
+        register an app, auto: run it in __call__
+        """
+        self.index[id(app)] = len(self.names)
+        self.names.append(name or type(app).__name__)
+        self.checks.append(0)
+        self.runs.append(0)
+        self.time_ns.append(0)
+        self.max_ns.append(0)
+        if auto:
+            self.apps.append(app)
+        return app
+
+    def reset_stats(self):
+        for i in range(len(self.names)):
+            self.checks[i] = 0
+            self.runs[i] = 0
+            self.time_ns[i] = 0
+            self.max_ns[i] = 0
+        self.start_ns = monotonic_ns()
+
+    def run(self, app):
+        """
+        same as app(), timed, the app is added on first use
+        """
+        i = self.index.get(id(app))
+        if i is None:
+            self.add(app, auto=False)
+            i = self.index[id(app)]
+        self.checks[i] += 1
+        if not app.repeat_timer.check():
+            return 0
+        start = monotonic_ns()
+        out = app.procedure()
+        dt = monotonic_ns() - start
+        self.runs[i] += 1
+        self.time_ns[i] += dt
+        if dt > self.max_ns[i]:
+            self.max_ns[i] = dt
+        return out
+
+    def __call__(self):
+        for app in self.apps:
+            self.run(app)
+
+    def remaining(self):
+        """
+        seconds until the next app is due, None without apps
+        """
+        out = None
+        for app in self.apps:
+            t = app.remaining()
+            if t is not None and (out is None or t < out):
+                out = t
+        return out
+
+    def top(self):
+        """
+        print the apps by time spent, like top
+        """
+        elapsed = monotonic_ns() - self.start_ns
+        print('task', 'checks', 'runs', 'total_ms', 'mean_us', 'max_us', 'cpu%')
+        order = sorted(range(len(self.names)), key=lambda i: -self.time_ns[i])
+        for i in order:
+            runs = self.runs[i]
+            print(
+                self.names[i],
+                self.checks[i],
+                runs,
+                self.time_ns[i] // 1000000,
+                self.time_ns[i] // runs // 1000 if runs else 0,
+                self.max_ns[i] // 1000,
+                round(100 * self.time_ns[i] / elapsed, 2) if elapsed else 0,
+            )
+
+class Top(Background_app):
+    """
+    print the summary of a BackgroundRegistry to serial
+    This is used for debug propose
+    """
+    def __init__(self, period, registry):
+        super().__init__(period=period)
+        self.registry = registry
+    def procedure(self):
+        self.registry.top()
+        return 0
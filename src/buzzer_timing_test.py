@@ -0,0 +1,117 @@
+"""
+Click length and PWM writes of the buzzer at several frame rates
+- frame toggled: the click of Menu.display before the sequencer,
+    on for one frame and off for the next one
+- sequencer: Buzzer.play(CLICK) on the event, Buzzer.update() every loop
+the click should last CLICK[0][1] whatever the frame rate,
+the PWM is written only when the tone changes
+"""
+from time import monotonic_ns
+from timetrigger import Repeat, Scheduler
+from driver import Buzzer, CLICK
+
+CLICKS = 3
+FRAMES_PER_CLICK = 4
+
+
+class FakePwm:
+    """
+    records the time the duty cycle is switched on and off
+    """
+
+    def __init__(self):
+        self.frequency_ = 0
+        self.duty_cycle_ = 0
+        self.writes = 0
+        self.on_time = 0
+        self.lengths = []
+
+    @property
+    def frequency(self):
+        return self.frequency_
+
+    @frequency.setter
+    def frequency(self, value):
+        self.frequency_ = value
+        self.writes += 1
+
+    @property
+    def duty_cycle(self):
+        return self.duty_cycle_
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        now = monotonic_ns()
+        if value and not self.duty_cycle_:
+            self.on_time = now
+        if not value and self.duty_cycle_:
+            self.lengths.append((now - self.on_time) / 1e6)
+        self.duty_cycle_ = value
+        self.writes += 1
+
+
+class LegacyBuzzer:
+    def __init__(self, pwm):
+        self.buzzer = pwm
+
+    def beep(self, freq):
+        if freq == 0:
+            self.buzzer.duty_cycle = 0
+        else:
+            self.buzzer.frequency = freq
+            self.buzzer.duty_cycle = 32768
+
+
+def run(fps, sequencer):
+    pwm = FakePwm()
+    frame = Repeat(fps)
+    if sequencer:
+        buzzer = Buzzer(pwm=pwm)
+        scheduler = Scheduler([frame, buzzer])
+    else:
+        buzzer = LegacyBuzzer(pwm)
+        scheduler = Scheduler([frame])
+    pwm.writes = 0
+    freq = 0
+    tictoc = True
+    frames = 0
+    while frames < CLICKS * FRAMES_PER_CLICK + 2:
+        if sequencer:
+            buzzer.update()
+        if not frame.check():
+            scheduler.sleep()
+            continue
+        click = frames % FRAMES_PER_CLICK == 0 and frames < CLICKS * FRAMES_PER_CLICK
+        if sequencer:
+            if click:
+                buzzer.play(CLICK)
+        else:
+            if click:
+                freq = 1000
+            # Menu.display
+            if tictoc:
+                buzzer.beep(freq)
+                freq = 0
+            else:
+                buzzer.beep(0)
+            tictoc = not tictoc
+        frames += 1
+    lengths = pwm.lengths
+    print(
+        "  FPS:",
+        fps,
+        "click ms: min",
+        round(min(lengths), 1),
+        "max",
+        round(max(lengths), 1),
+        "clicks:",
+        len(lengths),
+        "writes per frame:",
+        round(pwm.writes / frames, 2),
+    )
+
+
+for sequencer in (False, True):
+    print("sequencer" if sequencer else "frame toggled")
+    for fps in (4, 30, 60):
+        run(fps, sequencer)
@@ -4,34 +4,117 @@ This script contains driver classes for perferials, include
 - the PCB touch clickwheel (sometimes called the `ring` in the code)
 """
 #%% buzzer
-import pwmio
+from time import monotonic_ns
+
+# tone patterns, (frequency, seconds) steps, frequency 0 for silence
+# the click ends with a rest, so clicks in a row stay apart
+CLICK = ((1000, 0.03), (0, 0.03))
+ENTER = ((1200, 0.03),)
 
 # define buzzer
 class Buzzer:
     """
     Driver class of the buzzer
+    play() starts a tone pattern, update() steps it on time,
+    call update() every loop and add the buzzer to the Scheduler
+    pwm: or an object with frequency and duty_cycle instead of the pin
     """
-    def __init__(self, pin):
-        self.buzzer = pwmio.PWMOut(pin, variable_frequency=True)
+    def __init__(self, pin=None, pwm=None):
+        if pwm is None:
+            import pwmio
+
+            pwm = pwmio.PWMOut(pin, variable_frequency=True)
+        self.buzzer = pwm
         self.buzzer.duty_cycle = 0
+        self.freq = 0 # last frequency written
+        self.on = False
+        self.writes = 0
+        # sequencer
+        self.pattern = None
+        self.step = 0
+        self.deadline = 0 # ns, end of the current step
+        self.pending = None
     def beep(self, freq):
         """
         Turn the buzzer on at a certain sound wave frequency
         freq=0 to turn off
+        only changed values are written to the PWM
         """
         if freq == 0:
-            self.buzzer.duty_cycle = 0
+            if self.on:
+                self.buzzer.duty_cycle = 0
+                self.on = False
+                self.writes += 1
             return
         else:
-            self.buzzer.frequency = freq
-            self.buzzer.duty_cycle = 32768
+            if freq != self.freq:
+                self.buzzer.frequency = freq
+                self.freq = freq
+                self.writes += 1
+            if not self.on:
+                self.buzzer.duty_cycle = 32768
+                self.on = True
+                self.writes += 1
             return
+    def play(self, pattern):
+        """
+        play a tone pattern, see CLICK
+        while playing, it follows the current pattern,
+        a later call replaces the waiting one
+        """
+        if self.pattern is None:
+            self.start(pattern, monotonic_ns())
+        else:
+            self.pending = pattern
+    def start(self, pattern, now):
+        self.pattern = pattern
+        self.step = 0
+        freq, duration = pattern[0]
+        self.beep(freq)
+        self.deadline = now + int(duration * 1e9)
+    def stop(self):
+        self.pattern = None
+        self.pending = None
+        self.beep(0)
+    def update(self):
+        """
+        go to the next steps that are due, call every loop
+        steps are timed from the end of the previous step, not from the call
+        returns True when the tone changed
+        """
+        if self.pattern is None:
+            return False
+        now = monotonic_ns()
+        if now < self.deadline:
+            return False
+        while now >= self.deadline:
+            self.step += 1
+            if self.step < len(self.pattern):
+                freq, duration = self.pattern[self.step]
+            elif self.pending is not None:
+                self.pattern = self.pending
+                self.pending = None
+                self.step = 0
+                freq, duration = self.pattern[0]
+            else:
+                self.pattern = None
+                self.beep(0)
+                return True
+            self.deadline += int(duration * 1e9)
+        self.beep(freq)
+        return True
+    def remaining(self):
+        """
+        seconds until update() has work, None when silent
+        """
+        if self.pattern is None:
+            return None
+        return max(0, self.deadline - monotonic_ns()) / 1e9
 
 #%% clickwheel
-import touchio
 from math import sqrt, atan2, pi, exp, sin
-import time
-from timetrigger import Timer
+from touchwheel import WheelGeometry, Dial, WheelEventEngine, BUTTONS
+from touchpads import TouchPads
 
 # Relay to filter out shakes
 class ThetaFilter:
@@ -51,7 +134,6 @@ class ThetaFilter:
             y = 0
         self.remain = self.remain - y
         return y
-theta_filter = ThetaFilter()
 
 # # uncomment and ctrl enter for plot and testing
 # print('startplot:', 'y1', 'y2')
@@ -61,40 +143,51 @@ theta_filter = ThetaFilter()
 #     t = i / 100
 #     x = sin(t * 10)
 #     y1 += x
-#     y2 += theta_filter(x)
+#     y2 += ThetaFilter()(x)
 #     print(y1, y2)
 
-#%%
-            
+# Dial of the ring, steps are filtered
+class RelayDial(Dial):
+    """
+    Dial with the angle steps passed through a ThetaFilter
+    the filter keeps its remainder between touches
+    """
+    def __init__(self, N):
+        super().__init__(N)
+        self.filter = ThetaFilter()
+        self.reset(0)
+
+    def reset(self, theta):
+        super().reset(theta)
+        self.fresh = True
 
-def theta_diff(a, b):
-    c = a - b
-    if c >= pi:
-        c -= 2 * pi
-    if c < - pi:
-        c += 2 * pi
-    return c
+    def step(self, theta):
+        # no step on the touch edge
+        if self.fresh:
+            self.fresh = False
+            return 0
+        return self.filter(super().step(theta))
 
 # define button
 class Button:
     """
     Driver class of a single button
+    pad: or an object with raw_value instead of the pin
     """
-    def __init__(self, pin):
-        self.touch = touchio.TouchIn(pin)
-        self.need_init = True
+    def __init__(self, pin=None, pad=None):
+        # the baseline is measured by the first reads, untouched until then
+        if pad is None:
+            self.touch = TouchPads([pin])
+        else:
+            self.touch = TouchPads(pads=[pad])
         self.current = False
         self.last = False
         self.en = True
 
     def get(self):
-        # init on the first check
-        if self.need_init:
-            time.sleep(0.1)
-            self.touch.threshold = self.touch.raw_value + 100
-            self.need_init = False
+        raw = self.touch.read()[0]
         # compute output
-        self.current = self.touch.value
+        self.current = self.touch.ready and raw > self.touch.baseline[0] + 100
         out = 0
         if self.current and (not self.last):
             out = 1 # press edge
@@ -116,25 +209,28 @@ class Button:
 class Ring:
     """
     Driver class of the touch clickwheel
+    the events come from WheelEventEngine, like TouchWheelNavigationEvents,
+    get() returns the same dict every frame, updated in place
+    pads: or objects with raw_value instead of the pins
     """
-    def __init__(self, pins, center, N=8):
+    def __init__(self, pins, center, N=8, geometry=None, pads=None):
         # center button
         self.center = center
         # ring pins
-        self.ring = []
-        for i in range(4):
-            time.sleep(0.05)
-            self.ring.append(touchio.TouchIn(pins[i]))
-        # ring value range init
-        self.min = []
-        self.max = []
-        for i in range(4):
-            time.sleep(0.05)
-            self.min.append(self.ring[-1].raw_value)
-            self.max.append(self.min[-1] + 120)
+        if pads is None:
+            self.pads = TouchPads(pins)
+        else:
+            self.pads = TouchPads(pads=pads)
+        self.ring = self.pads.pads
+        # ring value range init, all pads in the same passes
+        self.min = list(self.pads.calibrate())
+        self.max = [value + 120 for value in self.min]
         # constants
-        self.alter_x = [-1, 0, 0, 1]
-        self.alter_y = [0, 1, -1, 0]
+        if geometry is None:
+            # left, up, down, right
+            geometry = WheelGeometry([(180, 1, 1), (90, 1, 1), (270, 1, 1), (0, 1, 1)])
+        self.coef, offset = geometry.projection(self.max, self.min)
+        self.x0, self.y0 = offset[0], offset[1]
         filtering_N = 2
         self.filtering_alpha = 1 / filtering_N
         self.dial_N = N
@@ -143,29 +239,64 @@ class Ring:
         self.pos_y = 0
         self.r = 0
         self.theta = 0
-        self.theta_last = 0
-        self.theta_d = 0
-        self.theta_residual = 0
         self.touch = False
-        self.touch_last = False
-        self.dial_changed = False
-        # timer
-        self.hold_timer = Timer()
+        # events
+        self.dial = RelayDial(N)
+        self.engine = WheelEventEngine(self.dial)
+        # outputs
+        self.buttons = {
+            'left': 0,
+            'right': 0,
+            'up': 0,
+            'down': 0,
+            'center': 0,
+            'ring': 0,
+        }
+        self.buttons_hold = {
+            'left': 0,
+            'right': 0,
+            'up': 0,
+            'down': 0,
+            'center': 0,
+        }
+        self.out = {
+            'dial': 0,
+            'buttons': self.buttons,
+            'buttons_hold': self.buttons_hold,
+            'theta': 0,
+            'theta_d': 0,
+            'r': 0,
+        }
+
+    def direction(self):
+        """
+        index in BUTTONS of the direction of the position
+        """
+        x = self.pos_x
+        y = self.pos_y
+        if x > abs(y):
+            return 4 # right
+        if x < -abs(y):
+            return 3 # left
+        if y > abs(x):
+            return 1 # up
+        if y < -abs(x):
+            return 2 # down
+        return -1
 
     def get(self):
         # read sensor
-        center_now = self.center.get()
-        ring_now = [r.raw_value for r in self.ring]
-
-        # conver sensor to weights
-        w = [
-            (ring_now[i] - self.min[i]) / (self.max[i] - self.min[i])
-            for i in range(4)
-        ]
+        self.center.get()
 
         # computer vector sum
-        pos_x = sum([w[i] * self.alter_x[i] for i in range(4)])
-        pos_y = sum([w[i] * self.alter_y[i] for i in range(4)])
+        coef = self.coef
+        pos_x = -self.x0
+        pos_y = -self.y0
+        j = 0
+        for value in self.pads.read():
+            pos_x += value * coef[j]
+            pos_y += value * coef[j + 1]
+            j += 3
 
         # 1st-order low pass filter
         self.pos_x = pos_x * self.filtering_alpha \
@@ -180,101 +311,38 @@ class Ring:
         # covert r to touch
         self.touch = self.r > 0.3
 
-        # init outputs
-        dial = 0
-
-        buttons = {
-            'left': 0,
-            'right': 0,
-            'up': 0,
-            'down': 0,
-            'center': 0,
-            'ring': 0,
-        }
-
-        # touch conditions
-        if self.touch and not self.touch_last: # ring touch edge
-            buttons['ring'] = 1
-            if self.pos_x > abs(self.pos_y): # right
-                buttons['right'] = 1
-            if self.pos_x < -abs(self.pos_y): # left
-                buttons['left'] = 1
-            if self.pos_y > abs(self.pos_x): # up
-                buttons['up'] = 1
-            if self.pos_y < -abs(self.pos_x): # down
-                buttons['down'] = 1
-            # init dial states
-            self.theta_residual = 0
-            self.theta_d = 0
-            self.theta_last = self.theta
-            self.dial_changed = False
-        elif self.touch and self.touch_last: # ring hold
-            buttons['ring'] = 2
-            self.theta_d = theta_filter(theta_diff(self.theta, self.theta_last))
-            self.theta_residual += self.theta_d
-            while self.theta_residual > pi / self.dial_N:
-                self.theta_residual -= 2 * pi / self.dial_N
-                dial += 1
-            while self.theta_residual < -pi / self.dial_N:
-                self.theta_residual += 2 * pi / self.dial_N
-                dial -= 1
-            if dial:
-                self.dial_changed = True
-        elif not self.touch and self.touch_last: # ring release edge
-            buttons['ring'] = -1
-            if not self.dial_changed:
-                if self.pos_x > abs(self.pos_y): # right
-                    buttons['right'] = -1
-                if self.pos_x < -abs(self.pos_y): # left
-                    buttons['left'] = -1
-                if self.pos_y > abs(self.pos_x): # up
-                    buttons['up'] = -1
-                if self.pos_y < -abs(self.pos_x): # down
-                    buttons['down'] = -1
-        else: # ring idle
-            # center button only works when ring is not touched
-            buttons['center'] = center_now
-
-        # hold detect
-        buttons_hold = {
-            'left': 0,
-            'right': 0,
-            'up': 0,
-            'down': 0,
-            'center': 0,
-        }
-
-        # long press
-        if buttons['ring'] == 1:
-            self.hold_timer.start(1)
-        if buttons['ring'] == 2 and self.hold_timer.over():
-            if not self.dial_changed:
-                self.dial_changed = True
-                if self.pos_x > abs(self.pos_y): # right
-                    buttons_hold['right'] = 1
-                if self.pos_x < -abs(self.pos_y): # left
-                    buttons_hold['left'] = 1
-                if self.pos_y > abs(self.pos_x): # up
-                    buttons_hold['up'] = 1
-                if self.pos_y < -abs(self.pos_x): # down
-                    buttons_hold['down'] = 1
-        if center_now == 1:
-            self.hold_timer.start(1)
-        if center_now == 2 and self.hold_timer.over():
-            buttons_hold['center'] = 1
-            self.center.en = False
+        # the ring first, the center button while the ring is not touched
+        if self.touch:
+            button = self.direction()
+        elif self.center.current:
+            button = 0
+        else:
+            button = -1
+        any = int(self.touch or self.center.current)
+        frame = self.engine.update(any, int(self.touch), button, self.theta)
 
         # output
-        out = {
-            'dial': -dial,
-            'buttons': buttons,
-            'buttons_hold': buttons_hold,
-            'theta': self.theta,
-            'theta_d': -self.theta_d,
-            'r': self.r,
-        }
-
-        # update
-        self.touch_last = self.touch
-        self.theta_last = self.theta
+        buttons = self.buttons
+        buttons_hold = self.buttons_hold
+        for name in BUTTONS:
+            buttons[name] = 0
+            buttons_hold[name] = 0
+        buttons['ring'] = self.engine.ring.diff
+        if self.touch and buttons['ring'] == 0:
+            buttons['ring'] = 2 # hold
+        if frame.press >= 0:
+            buttons[BUTTONS[frame.press]] = 1
+        if frame.release >= 0:
+            buttons[BUTTONS[frame.release]] = -1
+        if button == 0 and frame.press < 0:
+            # hold, up to the long press
+            if frame.long == 0 or not self.dial.changed:
+                buttons['center'] = 2
+        if frame.long >= 0:
+            buttons_hold[BUTTONS[frame.long]] = 1
+        out = self.out
+        out['dial'] = frame.dial
+        out['theta'] = self.theta
+        out['theta_d'] = -self.dial.theta_d
+        out['r'] = self.r
         return out
@@ -0,0 +1,214 @@
+"""
+Replay the same simulated traces through the event engine and the code it replaced,
+the baseline code is the frozen copy in touchwheel_legacy.py
+- TouchWheelPhysics and TouchWheelNavigationEvents, the events should match,
+    with smooth scroll the press, release and long events should match
+- driver.Ring, the output dicts should match frame by frame,
+    theta, theta_d and r up to rounding, the pads are now projected by WheelGeometry
+- a slide from the ring to the center pad, one touch for the new Ring,
+    a ring release in the middle of the touch for the old one
+- heap allocated per frame, when gc.mem_free() is available (CircuitPython)
+time comes from a frame clock, so long presses land on the same frame
+"""
+import gc
+from math import pi
+import timetrigger
+import touchwheel
+import touchwheel_legacy as legacy
+from touchwheel import (
+    TouchWheelPhysics,
+    TouchWheelNavigationEvents,
+    WheelGeometry,
+)
+from touchwheel_sim import SimulatedWheel, demo_trace, PAD_MAX, PAD_MIN
+from driver import Ring, Button
+
+FPS = 30
+
+
+class FrameClock:
+    def __init__(self):
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+    def tick(self):
+        self.time += 1 / FPS
+
+
+clock = FrameClock()
+timetrigger.monotonic = clock
+touchwheel.monotonic = clock
+legacy.monotonic = clock
+
+
+class FakeTouchIn:
+    """
+    touchio.TouchIn on a simulated pad, the pin is the pad
+    """
+
+    def __init__(self, pin):
+        self.pad = pin
+        self.threshold = 0
+
+    @property
+    def raw_value(self):
+        return self.pad.raw_value
+
+    @property
+    def value(self):
+        return self.pad.raw_value > self.threshold
+
+
+class FakeTouchio:
+    TouchIn = FakeTouchIn
+
+
+legacy.touchio = FakeTouchio
+
+
+def long_trace():
+    """
+    demo_trace with long presses, up and center held, then a spin held still
+    """
+    trace = [(None, 1, 0)] * 10 + demo_trace(600)
+    for theta, r in [(pi / 2, 1), (0, 0)]:
+        trace += [(theta, r, 0)] * (2 * FPS) + [(None, 1, 0)] * 10
+    theta = 0.3
+    for i in range(2 * FPS):
+        trace.append((theta, 1, 0))
+        if i < 20:
+            theta += 0.1
+    trace += [(None, 1, 0)] * 10
+    return trace
+
+
+def slide_trace():
+    """
+    a touch on the right of the ring, sliding to the center pad and released there
+    """
+    trace = [(None, 1, 0)] * 10 + [(0, 1, 0)] * 10
+    for i in range(10):
+        trace.append((0, 1 - i / 10, 0))
+    return trace + [(0, 0, 0)] * 10 + [(None, 1, 0)] * 10
+
+
+trace = long_trace()
+
+# pads of the ring driver, left, up, down, right, then the center pad
+RING_GEOMETRY = WheelGeometry(
+    [(180, 1, 1), (90, 1, 1), (270, 1, 1), (0, 1, 1), (0, 0, 1)]
+)
+# the old Ring takes the baseline of its last pad for all of them,
+# same baselines keep that from changing the result
+RING_MIN = [900] * 5
+# the ring driver assumes a range of 120 above the baseline
+RING_MAX = [value + 120 for value in RING_MIN]
+
+
+def run_navigation(smooth):
+    sim = SimulatedWheel()
+    old = legacy.TouchWheelNavigationEvents(
+        legacy.TouchWheelPhysics(*sim.pads, pad_max=PAD_MAX, pad_min=PAD_MIN), N=10
+    )
+    phy = TouchWheelPhysics(
+        pads=sim.pads, geometry=sim.geometry, pad_max=PAD_MAX, pad_min=PAD_MIN
+    )
+    new = TouchWheelNavigationEvents(phy, N=10, smooth=smooth)
+    outputs = [(old, []), (new, [])]
+    for theta, r, noise in trace:
+        sim.touch(theta, r, noise)
+        clock.tick()
+        for events, out in outputs:
+            event = events.get()
+            # smooth scroll replaces the dial events
+            if event is not None and not (smooth and event.name in ("dial", "scroll")):
+                out.append((event.name, event.val))
+    old, new = outputs[0][1], outputs[1][1]
+    print("smooth" if smooth else "dial", "events match:", old == new, len(old))
+    assert old == new
+    return outputs[1][0]
+
+
+def make_rings():
+    sim = SimulatedWheel(RING_GEOMETRY, pad_max=RING_MAX, pad_min=RING_MIN)
+    old = legacy.Ring(sim.pads[:4], legacy.Button(sim.pads[4]), N=10)
+    new = Ring(None, Button(pad=sim.pads[4]), N=10, pads=sim.pads[:4])
+    return sim, old, new
+
+
+def same_output(old, new):
+    for key in ("dial", "buttons", "buttons_hold"):
+        if old[key] != new[key]:
+            return False
+    for key in ("theta", "theta_d", "r"):
+        if abs(old[key] - new[key]) > 1e-9:
+            return False
+    return True
+
+
+def run_ring():
+    sim, old, new = make_rings()
+    frames = 0
+    events = 0
+    for theta, r, noise in trace:
+        sim.touch(theta, r, noise)
+        clock.tick()
+        expected = old.get()
+        got = new.get()
+        if not same_output(expected, got):
+            break
+        frames += 1
+        events += sum([v != 0 for v in expected["buttons"].values()])
+        events += sum(expected["buttons_hold"].values()) + abs(expected["dial"])
+    print("ring outputs match:", frames == len(trace), frames, "frames")
+    print("  events:", events)
+    if frames < len(trace):
+        print("  frame", frames, "expected", expected, "got", got)
+    assert frames == len(trace)
+    return new
+
+
+def button_edges(ring, sim, trace):
+    """
+    (button, 1 or -1) for the press and release edges of the ring output
+    """
+    edges = []
+    for theta, r, noise in trace:
+        sim.touch(theta, r, noise)
+        clock.tick()
+        buttons = ring.get()["buttons"]
+        for name in ("center", "up", "down", "left", "right"):
+            if buttons[name] in (1, -1):
+                edges.append((name, buttons[name]))
+    return edges
+
+
+def run_slide():
+    sim, old, new = make_rings()
+    old_edges = button_edges(old, sim, slide_trace())
+    new_edges = button_edges(new, sim, slide_trace())
+    print("slide to the center, old:", old_edges)
+    print("  new:", new_edges)
+    assert ("right", -1) in old_edges
+    assert new_edges == [("right", 1), ("center", -1)]
+
+
+def bytes_per_frame(step):
+    if not hasattr(gc, "mem_free"):
+        return
+    gc.collect()
+    mem_free = gc.mem_free()
+    for i in range(100):
+        step()
+    print("  bytes per frame:", (mem_free - gc.mem_free()) / 100)
+
+
+run_navigation(False)
+events = run_navigation(True)
+bytes_per_frame(events.get)
+ring = run_ring()
+bytes_per_frame(ring.get)
+run_slide()
+print("passed")
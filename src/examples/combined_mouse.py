@@ -18,12 +18,12 @@ License: GPL3
 Github: https://github.com/urfdvw
 Email: urfdvw@gmail.com
 """
-from time import sleep
 import board
 import touchio
 import usb_hid
 from adafruit_hid.mouse import Mouse
 from touchwheel import TouchWheelPhysics, TouchWheelNavigationEvents
+from hid_output import MouseOutput
 
 mouse = Mouse(usb_hid.devices)
 
@@ -43,14 +43,11 @@ navi_events = TouchWheelNavigationEvents(
     N=10,  # number of dial per-cycle, increase N to speed up dial but decrease accuracy
 )
 
+mouse_out = MouseOutput(mouse)
+
 for i in range(100000):
     event = navi_events.get()
-    raw = navi_events.phy
-    if raw.l > 0.8:
-        mouse.move(
-            x=int(raw.x * 10),
-            y=-int(raw.y * 10),
-        )
+    mouse_out.update(navi_events.phy)
     if event:
         print(event)
         if event.val == 'center':
@@ -31,10 +31,8 @@ from time import sleep
 import board
 import touchio
 import usb_hid
-from adafruit_hid.gamepad import Gamepad
 from touchwheel import TouchWheelPhysics
-
-gamepad = Gamepad(usb_hid.devices)
+from hid_output import JoystickOutput
 
 wheel_phy = TouchWheelPhysics(
     up=touchio.TouchIn(board.D7),
@@ -47,24 +45,13 @@ wheel_phy = TouchWheelPhysics(
     pad_min=[904, 1239, 862, 879, 910],
 )
 
-
-def limit(x):
-    if x > 127:
-        return 127
-    if x < -127:
-        return -127
-    return int(x)
-
+# x, y on the first joystick, z and r on the second one
+# a report is sent only when an axis moves by more than the hysteresis
+joystick = JoystickOutput(usb_hid.devices)
 
 print("startplot:", "x", "y")  # For data ploting
 while True:
     sleep(0.01)
     raw = wheel_phy.get()
-    if wheel_phy.l.now > 0.8:
-        gamepad.move_joysticks(
-            x=limit(raw.x * 100),
-            y=-limit(raw.y * 100),
-        )
-    else:
-        gamepad.move_joysticks(x=0, y=0)
+    joystick.update(raw)
     print(raw.x, raw.y)  # For data ploting
@@ -20,12 +20,12 @@ License: GPL3
 Github: https://github.com/urfdvw
 Email: urfdvw@gmail.com
 """
-from time import sleep
 import board
 import touchio
 import usb_hid
 from adafruit_hid.mouse import Mouse
 from touchwheel import TouchWheelPhysics
+from hid_output import MouseOutput
 
 mouse = Mouse(usb_hid.devices)
 
@@ -40,13 +40,12 @@ wheel_phy = TouchWheelPhysics(
     pad_min=[904, 1239, 862, 879, 910],
 )
 
+# one report per USB poll at most, fractional motion is kept for the next one
+mouse_out = MouseOutput(mouse)
+
 print("startplot:", "x", "y")  # For data ploting
 for i in range(100000):
-    sleep(0.01)
     raw = wheel_phy.get()
-    if wheel_phy.z.now > 0.8:
-        mouse.move(
-            x=int(raw.x * 10),
-            y=-int(raw.y * 10),
-        )
+    mouse_out.update(raw)
     # print(raw.x, raw.y)  # For data ploting
+print(mouse_out.stats())
@@ -0,0 +1,89 @@
+"""
+Compare the float and the fixed point touch wheel on the same simulated trace
+- events should match, dial totals within TOLERANCE
+- sectors should match with x and y beyond ONE, pads beyond pad_max
+- frames per second
+- heap allocated per frame, when gc.mem_free() is available (CircuitPython)
+"""
+from time import monotonic
+import gc
+from touchwheel import TouchWheelPhysics, TouchWheelNavigationEvents
+from math import pi
+from touchwheel import SectorClassifier
+from touchwheel_fixed import (
+    TouchWheelPhysicsInt,
+    TouchWheelNavigationEventsInt,
+    SectorClassifierInt,
+    ONE,
+)
+from touchwheel_sim import SimulatedWheel, demo_trace, PAD_MAX, PAD_MIN
+
+TOLERANCE = 1  # dial steps
+trace = demo_trace(600)
+
+
+def run(Physics, Events):
+    sim = SimulatedWheel()
+    phy = Physics(
+        pads=sim.pads, geometry=sim.geometry, pad_max=PAD_MAX, pad_min=PAD_MIN
+    )
+    events = Events(phy, N=10)
+    out = []
+    gc.collect()
+    mem_free = gc.mem_free() if hasattr(gc, "mem_free") else None
+    start_time = monotonic()
+    for theta, r, noise in trace:
+        sim.touch(theta, r, noise)
+        event = events.get()
+        if event is not None:
+            out.append((event.name, event.val))
+    duration = monotonic() - start_time
+    if mem_free is not None:
+        # includes the simulated pads, compare the two numbers
+        print("  bytes per frame:", (mem_free - gc.mem_free()) / len(trace))
+    print("  FPS:", len(trace) / duration)
+    return out
+
+
+def summary(events):
+    buttons = [e for e in events if e[0] != "dial"]
+    dial = sum([e[1] for e in events if e[0] == "dial"])
+    return buttons, dial
+
+
+print("float")
+float_events = run(TouchWheelPhysics, TouchWheelNavigationEvents)
+print("fixed")
+fixed_events = run(TouchWheelPhysicsInt, TouchWheelNavigationEventsInt)
+
+float_buttons, float_dial = summary(float_events)
+fixed_buttons, fixed_dial = summary(fixed_events)
+print("button events match:", float_buttons == fixed_buttons, len(float_buttons))
+print("dial total:", float_dial, fixed_dial)
+assert float_buttons == fixed_buttons
+assert abs(float_dial - fixed_dial) <= TOLERANCE
+
+# over range, a pad pressed far beyond pad_max gives |x| or |y| beyond ONE
+float_sectors = SectorClassifier(4, width=pi / 2)
+fixed_sectors = SectorClassifierInt(4, width=pi / 2)
+sim = SimulatedWheel()
+phy = TouchWheelPhysicsInt(
+    pads=sim.pads, geometry=sim.geometry, pad_max=PAD_MAX, pad_min=PAD_MIN
+)
+largest = 0
+mismatch = 0
+for k in range(16):
+    sim.touch(k * pi / 8 + 0.1, 1)
+    for i in range(len(sim.pads)):
+        sim.pads[i].raw_value += 10 * (sim.pads[i].raw_value - PAD_MIN[i])
+    for i in range(4):
+        sample = phy.get()
+    largest = max(largest, abs(sample.x), abs(sample.y))
+    x = sample.x / ONE
+    y = sample.y / ONE
+    if float_sectors.classify(x, y) != fixed_sectors.classify(sample.x, sample.y):
+        mismatch += 1
+print("over range: largest x, y", largest / ONE, "sector mismatches", mismatch)
+assert largest > ONE
+assert mismatch == 0
+print("passed")
@@ -0,0 +1,515 @@
+# %% HID output stages
+"""
+HID reports from TouchWheelPhysics samples
+"""
+import struct
+from time import monotonic
+
+
+def interpolate(curve, x):
+    """
+    piecewise linear curve of (x, y) pairs in increasing x
+    flat outside of the pairs
+    """
+    if x <= curve[0][0]:
+        return curve[0][1]
+    for i in range(1, len(curve)):
+        x1, y1 = curve[i]
+        if x < x1:
+            x0, y0 = curve[i - 1]
+            return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+    return curve[-1][1]
+
+
+class MouseOutput:
+    """
+    Mouse movement from the touch position, like a joystick
+    the speed is given by a gain curve of the distance to the center,
+    fractional counts are accumulated until they add up to a full count
+    mouse: adafruit_hid.mouse.Mouse
+    curve: (r, speed) pairs, speed in counts per second
+    interval: seconds between reports, at most one report per USB poll
+    thr_z: touch threshold on z
+    """
+
+    def __init__(
+        self,
+        mouse,
+        curve=((0, 0), (0.3, 150), (1, 1000)),
+        interval=0.008,
+        thr_z=0.8,
+        invert_y=True,
+    ):
+        self.mouse = mouse
+        self.curve = curve
+        self.interval = interval
+        self.thr_z = thr_z
+        self.y_sign = -1 if invert_y else 1
+        self.touched = False
+        self.dx = 0
+        self.dy = 0
+        self.last_time = monotonic()
+        self.last_report = self.last_time
+        self.last_slot = self.last_time  # last report or skipped slot
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.start_time = monotonic()
+        self.reports = 0
+        self.skipped = 0  # report slots with no full count to send
+        self.discarded = 0  # counts left when the finger lifted
+
+    def update(self, sample):
+        """
+        call every loop with the output of TouchWheelPhysics.get()
+        returns True when a report was sent
+        """
+        now = monotonic()
+        dt = now - self.last_time
+        self.last_time = now
+        if sample.z <= self.thr_z:
+            if self.touched:
+                self.touched = False
+                self.discarded += abs(self.dx) + abs(self.dy)
+                self.dx = 0
+                self.dy = 0
+            return False
+        if not self.touched:
+            # no motion for the time before the touch
+            self.touched = True
+            dt = 0
+        # accumulate
+        if sample.r > 0:
+            speed = interpolate(self.curve, sample.r) * dt / sample.r
+            self.dx += sample.x * speed
+            self.dy += sample.y * speed * self.y_sign
+        # report
+        if now - self.last_report < self.interval:
+            return False
+        x = max(-127, min(127, int(self.dx)))
+        y = max(-127, min(127, int(self.dy)))
+        if x == 0 and y == 0:
+            # counted once per interval, the report stays due
+            if now - self.last_slot >= self.interval:
+                self.last_slot = now
+                self.skipped += 1
+            return False
+        self.mouse.move(x=x, y=y)
+        self.dx -= x
+        self.dy -= y
+        self.last_report = now
+        self.last_slot = now
+        self.reports += 1
+        return True
+
+    def stats(self):
+        """
+        reports_per_second: since reset_stats()
+        residual: counts waiting for the next report
+        """
+        elapsed = monotonic() - self.start_time
+        return {
+            "reports_per_second": self.reports / elapsed if elapsed > 0 else 0,
+            "reports": self.reports,
+            "skipped": self.skipped,
+            "residual": abs(self.dx) + abs(self.dy),
+            "discarded": self.discarded,
+        }
+
+
+class JoystickOutput:
+    """
+    Gamepad joysticks from the touch position
+    x, y on the first joystick, z and r on the second one (z and r_z)
+    the report is packed in place and sent only when an axis moves
+    devices: usb_hid.devices, with the gamepad of adafruit_hid.gamepad
+    scale: joystick counts per unit of x, y, z, r, the sign flips an axis
+    deadzone: |x| and |y| below it are 0
+    hysteresis: counts beyond half a count to move away from the last value
+    thr_z: touch threshold on z, all axes are 0 without touch
+    """
+
+    def __init__(
+        self,
+        devices,
+        scale=(100, -100, 100, 100),
+        deadzone=0.05,
+        hysteresis=0.3,
+        thr_z=0.8,
+    ):
+        from adafruit_hid import find_device
+
+        self.device = find_device(devices, usage_page=0x1, usage=0x05)
+        self.scale = scale
+        self.deadzone = deadzone
+        self.step = 0.5 + hysteresis
+        self.thr_z = thr_z
+        # buttons 1-16, joystick 0 x, y, joystick 1 x, y
+        self.report = bytearray(6)
+        self.buttons = 0
+        self.axes = [0, 0, 0, 0]
+        self.dirty = True
+        self.sent = 0
+        self.suppressed = 0
+
+    def press(self, button):
+        self.buttons |= 1 << (button - 1)
+        self.dirty = True
+
+    def release(self, button):
+        self.buttons &= ~(1 << (button - 1))
+        self.dirty = True
+
+    def quantize(self, i, value):
+        axes = self.axes
+        v = max(-127, min(127, value * self.scale[i]))
+        q = axes[i]
+        if v == 0:
+            if q == 0:
+                return
+            q = 0
+        elif v - q > self.step or q - v > self.step:
+            q = round(v)
+        else:
+            return
+        axes[i] = q
+        self.dirty = True
+
+    def update(self, sample):
+        """
+        call every loop with the output of TouchWheelPhysics.get()
+        returns True when a report was sent
+        """
+        if sample.z > self.thr_z:
+            x = sample.x
+            y = sample.y
+            if -self.deadzone < x < self.deadzone:
+                x = 0
+            if -self.deadzone < y < self.deadzone:
+                y = 0
+            self.quantize(0, x)
+            self.quantize(1, y)
+            self.quantize(2, sample.z)
+            self.quantize(3, sample.r)
+        else:
+            for i in range(4):
+                self.quantize(i, 0)
+        if not self.dirty:
+            self.suppressed += 1
+            return False
+        axes = self.axes
+        struct.pack_into(
+            "<Hbbbb", self.report, 0, self.buttons, axes[0], axes[1], axes[2], axes[3]
+        )
+        self.device.send_report(self.report)
+        self.dirty = False
+        self.sent += 1
+        return True
+
+    def stats(self):
+        return {"sent": self.sent, "suppressed": self.suppressed}
+
+
+# devices of HidQueue
+KEYBOARD = 0
+MOUSE = 1
+CONSUMER = 2
+GAMEPAD = 3
+# (usage page, usage, report size) of the devices, to probe USB with
+PROBES = ((0x01, 0x06, 8), (0x01, 0x02, 4), (0x0C, 0x01, 2), (0x01, 0x05, 6))
+
+
+class QueuedDevice:
+    """
+    stand-in for an adafruit_hid device, its actions go to a HidQueue
+    every queued action sends one report, so it can be sent again
+    after an error without repeating a key or a move,
+    composite calls like send() queue a press and a release
+    """
+
+    def __init__(self, queue, kind):
+        self.queue = queue
+        self.kind = kind
+
+    def put(self, name, args=()):
+        self.queue.put(self.kind, name, args)
+
+    def put_pair(self, name, args, release, release_args=()):
+        # both or none, a press is never queued without its release
+        self.queue.put(self.kind, name, args, release, release_args)
+
+
+class QueuedKeyboard(QueuedDevice):
+    def press(self, *keycodes):
+        self.put("press", keycodes)
+
+    def release(self, *keycodes):
+        self.put("release", keycodes)
+
+    def release_all(self):
+        self.put("release_all")
+
+    def send(self, *keycodes):
+        self.put_pair("press", keycodes, "release_all")
+
+    @property
+    def led_status(self):
+        # read directly, all off until USB is ready
+        device = self.queue.device(KEYBOARD)
+        if device is None:
+            return b"\x00"
+        return device.led_status
+
+    def led_on(self, led_code):
+        return bool(self.led_status[0] & led_code)
+
+    @property
+    def ready(self):
+        """
+        USB is up and every keyboard action is sent,
+        led_status reflects them once the host answers
+        """
+        return self.queue.ready and not self.queue.pending(KEYBOARD)
+
+
+class QueuedMouse(QueuedDevice):
+    def press(self, buttons):
+        self.put("press", (buttons,))
+
+    def release(self, buttons):
+        self.put("release", (buttons,))
+
+    def release_all(self):
+        self.put("release_all")
+
+    def click(self, buttons):
+        self.put_pair("press", (buttons,), "release", (buttons,))
+
+    def move(self, x=0, y=0, wheel=0):
+        # one report each, like Mouse.move
+        while x or y or wheel:
+            dx = min(max(-127, x), 127)
+            dy = min(max(-127, y), 127)
+            dwheel = min(max(-127, wheel), 127)
+            self.put("move", (dx, dy, dwheel))
+            x -= dx
+            y -= dy
+            wheel -= dwheel
+
+
+class QueuedConsumerControl(QueuedDevice):
+    def press(self, consumer_code):
+        self.put("press", (consumer_code,))
+
+    def release(self):
+        self.put("release")
+
+    def send(self, consumer_code):
+        self.put_pair("press", (consumer_code,), "release")
+
+
+class QueuedGamepad(QueuedDevice):
+    def press_buttons(self, *buttons):
+        self.put("press_buttons", buttons)
+
+    def release_buttons(self, *buttons):
+        self.put("release_buttons", buttons)
+
+    def release_all_buttons(self):
+        self.put("release_all_buttons")
+
+    def click_buttons(self, *buttons):
+        self.put_pair("press_buttons", buttons, "release_buttons", buttons)
+
+    def move_joysticks(self, x=None, y=None, z=None, r_z=None):
+        self.put("move_joysticks", (x, y, z, r_z))
+
+    def reset_all(self):
+        self.put("reset_all")
+
+
+class HidQueue:
+    """
+    Queue of keyboard, mouse, consumer control and gamepad actions
+    apps and background tasks use self.keyboard, self.mouse,
+    self.consumer_control and self.gamepad like the adafruit_hid devices,
+    drain() sends the actions from the main loop once USB is ready,
+    so boot goes on without USB
+    devices: usb_hid.devices by default
+    max_depth: actions beyond it are dropped
+    per_drain: actions sent per drain(), each may wait for a USB poll
+    retry_period: seconds between attempts while USB is not ready
+    """
+
+    def __init__(self, devices=None, max_depth=256, per_drain=4, retry_period=1.0):
+        self.usb_devices = devices
+        self.max_depth = max_depth
+        self.per_drain = per_drain
+        self.retry_period = retry_period
+        self.queue = []  # (time, kind, method name, args)
+        self.devices = None  # adafruit_hid devices by kind, once USB is ready
+        self.ready = False
+        self.retry_time = 0
+        self.keyboard = QueuedKeyboard(self, KEYBOARD)
+        self.mouse = QueuedMouse(self, MOUSE)
+        self.consumer_control = QueuedConsumerControl(self, CONSUMER)
+        self.gamepad = QueuedGamepad(self, GAMEPAD)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.sent = 0
+        self.dropped = 0
+        self.max_seen = 0  # deepest queue
+        self.latency_sum = 0
+        self.latency_max = 0
+
+    def put(self, kind, name, args, release=None, release_args=()):
+        """
+        queue an action, or an action and its release, both or none
+        """
+        n = 1 if release is None else 2
+        if len(self.queue) + n > self.max_depth:
+            self.dropped += n
+            return
+        now = monotonic()
+        self.queue.append((now, kind, name, args))
+        if release is not None:
+            self.queue.append((now, kind, release, release_args))
+        if len(self.queue) > self.max_seen:
+            self.max_seen = len(self.queue)
+
+    def pending(self, kind):
+        """
+        actions of a device waiting in the queue
+        """
+        n = 0
+        for item in self.queue:
+            if item[1] == kind:
+                n += 1
+        return n
+
+    def device(self, kind):
+        if self.devices is None:
+            return None
+        return self.devices[kind]
+
+    def connect(self):
+        """
+        create the devices when USB is ready
+        never blocks: the adafruit_hid constructors sleep 1 s
+        when the host is not ready, so they run only after a probe went through
+        """
+        if monotonic() < self.retry_time:
+            return False
+        import supervisor
+
+        if supervisor.runtime.usb_connected and self.probe():
+            if self.devices is None:
+                self.devices = self.create()
+            self.ready = self.devices is not None
+        # after the probe and create, whatever time they took
+        self.retry_time = monotonic() + self.retry_period
+        return self.ready
+
+    def get_usb_devices(self):
+        if self.usb_devices is None:
+            import usb_hid
+
+            return usb_hid.devices
+        return self.usb_devices
+
+    def probe(self):
+        """
+        send an empty report to the first enabled device,
+        False while the host has not enumerated it
+        """
+        from adafruit_hid import find_device
+
+        usb_devices = self.get_usb_devices()
+        for usage_page, usage, size in PROBES:
+            try:
+                device = find_device(usb_devices, usage_page=usage_page, usage=usage)
+            except ValueError:
+                # not enabled in boot.py
+                continue
+            try:
+                device.send_report(bytes(size))
+            except OSError:
+                return False
+            return True
+        return False
+
+    def create(self):
+        from adafruit_hid.keyboard import Keyboard
+        from adafruit_hid.mouse import Mouse
+        from adafruit_hid.consumer_control import ConsumerControl
+        from adafruit_hid.gamepad import Gamepad
+
+        usb_devices = self.get_usb_devices()
+        devices = []
+        for cls in (Keyboard, Mouse, ConsumerControl, Gamepad):
+            try:
+                devices.append(cls(usb_devices))
+            except ValueError:
+                # not enabled in boot.py, its actions are dropped
+                devices.append(None)
+            except OSError:
+                # the host went away after the probe
+                return None
+        return devices
+
+    def remaining(self):
+        """
+        seconds until drain() has work, None with an empty queue
+        """
+        if not self.queue:
+            return None
+        if self.ready:
+            return 0
+        return max(0, self.retry_time - monotonic())
+
+    def drain(self):
+        """
+        send up to per_drain queued actions, call every loop
+        returns the number of actions sent
+        """
+        if not self.queue:
+            return 0
+        if not self.ready and not self.connect():
+            return 0
+        queue = self.queue
+        n = 0
+        while queue and n < self.per_drain:
+            stamp, kind, name, args = queue[0]
+            device = self.devices[kind]
+            if device is None:
+                self.dropped += 1
+            else:
+                try:
+                    getattr(device, name)(*args)
+                except OSError:
+                    # host suspended or endpoint busy, keep the action
+                    self.ready = False
+                    return n
+                latency = monotonic() - stamp
+                self.latency_sum += latency
+                if latency > self.latency_max:
+                    self.latency_max = latency
+                self.sent += 1
+                n += 1
+            queue.pop(0)
+        return n
+
+    def stats(self):
+        """
+        depth: actions waiting
+        latency: seconds from put to sent, mean and max
+        """
+        return {
+            "depth": len(self.queue),
+            "max_depth": self.max_seen,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "latency_mean": self.latency_sum / self.sent if self.sent else 0,
+            "latency_max": self.latency_max,
+        }
@@ -1,64 +1,443 @@
-import json, sys, supervisor, time
-from matcher import BracketMatcher, MatcherProcessor
+import json, sys, time, struct, binascii
+try:
+    import supervisor
+except ImportError:
+    # CPython, serial and output are given, see host/connected_variables_device.py
+    supervisor = None
+try:
+    import usb_cdc
+except ImportError:
+    # boards without usb_cdc read the console from stdin
+    usb_cdc = None
+from matcher import BracketMatcher, MatcherProcessor, RESTART
 
 CV_JSON_START = "<CV>"
 CV_JSON_END = "</CV>"
+CV_BINARY_START = "<CVB>"
+CV_BINARY_END = "</CVB>"
+CV_SCHEMA_START = "<CVS>"
+CV_SCHEMA_END = "</CVS>"
 LINE_END = "\n"
 UPDATE_PERIOD = 0.5
+RX_BUFFER_SIZE = 64
+# serial_read budget per call, the rest waits in the CDC buffer
+# and the host is slowed down by USB flow control when it is full
+RX_BUDGET_BYTES = 256
+RX_BUDGET_NS = 2000000  # 2 ms
+# longer frames are dropped, a new <CV> starts over on a lost </CV>
+MAX_FRAME_SIZE = 512
+
+# binary mode
+# the host sends {"__mode__": "binary"} or {"__mode__": "json"} to switch
+MODE_KEY = "__mode__"
+# heartbeats between full snapshots, the rest only send changed variables
+# or an empty keepalive frame when nothing changed
+FULL_SNAPSHOT_EVERY = 10
+# frame kinds
+FULL = b"F"
+DELTA = b"D"
+# longest str or JSON value in a binary frame, 2 bytes of length
+MAX_VALUE_SIZE = 0xFFFF
+# range of "i" values, larger ints are sent as JSON
+INT32_MIN = -(1 << 31)
+INT32_MAX = (1 << 31) - 1
+
+
+def type_code(value):
+    """
+    code of the value type in binary frames
+    ? bool, i int32, f float32, s utf-8 string, j anything else as JSON
+    ints beyond int32 are JSON
+    """
+    if type(value) == bool:
+        return "?"
+    if type(value) == int:
+        return "i" if INT32_MIN <= value <= INT32_MAX else "j"
+    if type(value) == float:
+        return "f"
+    if type(value) == str:
+        return "s"
+    return "j"
+
+
+def print_text(text):
+    print(text, end='')
+
+
+class Batch:
+    """
+    context of ConnectedVariables.batch()
+    writes inside are sent as one frame when the outermost batch exits
+    """
+
+    def __init__(self, cv):
+        self.cv = cv
+
+    def __enter__(self):
+        self.cv.batching += 1
+        return self.cv
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cv.batching -= 1
+        if not self.cv.batching:
+            self.cv.flush()
+
 
 class ConnectedVariables:
-    def __init__(self):
+    """
+    variables shared with the host through frames on the serial console
+    serial: stream with in_waiting and readinto, the REPL console by default
+    output: function printing a frame, print by default
+    """
+
+    def __init__(self, serial=None, output=print_text):
         self.vars = {}
         self.cv_processor = MatcherProcessor(
-            BracketMatcher(CV_JSON_START, CV_JSON_END),
-            exit_action=self.exit_action
+            BracketMatcher(
+                CV_JSON_START.encode(), CV_JSON_END.encode(), policy=RESTART
+            ),
+            exit_action=self.exit_action,
+            max_branch=MAX_FRAME_SIZE,
+            decode=False,  # by exit_action, a bad byte is a bad frame
         )
+        self.frames = 0  # frames received
+        # errors are counted, not printed
+        self.bad_frames = 0  # not utf-8 or not a JSON object
+        self.unknown_names = 0
+        self.bad_values = 0
+        # serial is read into this buffer, the matcher works on slices of it
+        self.rx_buffer = bytearray(RX_BUFFER_SIZE)
+        self.rx_view = memoryview(self.rx_buffer)
+        self.console = serial is None
+        self.serial = getattr(usb_cdc, 'console', None) if self.console else serial
+        self.output = output
         self.last_time_stamp = time.monotonic()
+        # binary mode, variables are sent by id, in the order of define
+        self.binary = False
+        self.ids = {}
+        self.names = []
+        self.codes = []
+        self.types = []  # type of each variable, checked by write
+        # name: (id, caster), to apply host updates in one pass
+        self.schema = {}
+        self.keys = []  # '"name": ' of JSON frames
+        self.heart_beats = 0
+        # change tracking, by id
+        # a variable is sent when its version is newer than the acked one
+        # the console is reliable and ordered, so a sent frame is the ack
+        self.version = 0
+        self.versions = []
+        self.acked = []
+        self.periods = []  # min seconds between heartbeat sends
+        self.sent_time = []
+        # JSON of "j" variables when last sent, lists and dicts changed in place
+        # are found by comparing it on the heartbeat
+        self.sent_json = []
+        # batched writes, ids to send at the end of the batch
+        self.batching = 0
+        self.pending = {}
 
     def update(self):
         self.serial_read()
-        print(CV_JSON_START + json.dumps(self.vars) + CV_JSON_END, end='')
+        self.send_changes()
+
+    def send_changes(self):
+        """
+        the sending part of a heartbeat
+        """
+        self.heart_beats += 1
+        if self.heart_beats >= FULL_SNAPSHOT_EVERY:
+            self.heart_beats = 0
+            self.pending = {}
+            self.send_ids(range(len(self.names)), full=True)
+            return
+        self.find_in_place()
+        now = time.monotonic()
+        # pending writes go out now whatever their period
+        pending = self.pending
+        self.pending = {}
+        changed = [
+            i for i in range(len(self.names))
+            if i in pending
+            or self.versions[i] > self.acked[i]
+            and now - self.sent_time[i] >= self.periods[i]
+        ]
+        # empty when idle, a keepalive for the host
+        self.send_ids(changed)
+
+    def touch(self, var_name):
+        """
+        mark a variable as changed
+        a list or dict changed in place is found by the next heartbeat anyway
+        """
+        self.version += 1
+        self.versions[self.ids[var_name]] = self.version
+
+    def find_in_place(self):
+        """
+        mark "j" variables whose JSON differs from the one last sent
+        """
+        for i in range(len(self.names)):
+            if (
+                self.codes[i] == "j"
+                and self.versions[i] <= self.acked[i]
+                and json.dumps(self.vars[self.names[i]]) != self.sent_json[i]
+            ):
+                self.version += 1
+                self.versions[i] = self.version
+
+    def batch(self):
+        """
+        collect writes and send them as one frame
+
+            with cv.batch():
+                cv.write("x", x)
+                cv.write("y", y)
+
+        a variable written several times is sent once, with its last value
+        a heartbeat inside the batch sends what is pending so far
+        """
+        return Batch(self)
+
+    def flush(self):
+        """
+        send the pending writes of a batch
+        """
+        if self.pending:
+            ids = list(self.pending)
+            self.pending = {}
+            self.send_ids(ids)
+
+    def send_ids(self, ids, full=False):
+        """
+        send the given variable ids in the current mode and ack them
+        """
+        if self.binary:
+            self.send_binary(FULL if full else DELTA, ids)
+        else:
+            self.output(self.encode_json(ids))
+        now = time.monotonic()
+        for i in ids:
+            self.acked[i] = self.versions[i]
+            self.sent_time[i] = now
+            if self.codes[i] == "j":
+                self.sent_json[i] = json.dumps(self.vars[self.names[i]])
+
+    def encode_json(self, ids):
+        """
+        JSON frame of the given variable ids, keys are encoded by define
+        """
+        vars = self.vars
+        names = self.names
+        keys = self.keys
+        body = ", ".join([keys[i] + json.dumps(vars[names[i]]) for i in ids])
+        return CV_JSON_START + "{" + body + "}" + CV_JSON_END
+
+    def set_mode(self, binary):
+        """
+        switch between JSON and binary frames
+        the schema and a full snapshot are sent when entering binary mode
+        """
+        self.binary = binary
+        if binary:
+            self.send_schema()
+            self.heart_beats = 0
+            self.send_ids(range(len(self.names)), full=True)
+
+    def send_schema(self):
+        schema = [[self.names[i], self.codes[i]] for i in range(len(self.names))]
+        self.output(CV_SCHEMA_START + json.dumps(schema) + CV_SCHEMA_END)
+
+    def fit_code(self, i, value):
+        """
+        an int variable is sent as JSON from its first value beyond int32 on
+        in binary mode the host gets the new schema before the value
+        """
+        if self.codes[i] == "i" and not INT32_MIN <= value <= INT32_MAX:
+            self.codes[i] = "j"
+            if self.binary:
+                self.send_schema()
+
+    def encode_value(self, i):
+        """
+        bytes of a variable in a binary frame
+        None when the value is too long for the 2 bytes of length
+        """
+        value = self.vars[self.names[i]]
+        code = self.codes[i]
+        if code == "s":
+            data = value.encode()
+        elif code == "j":
+            data = json.dumps(value).encode()
+        else:
+            return struct.pack("<" + code, value)
+        if len(data) > MAX_VALUE_SIZE:
+            return None
+        return struct.pack("<H", len(data)) + data
+
+    def send_binary(self, kind, ids):
+        """
+        send a frame of the given variable ids
+        kind (1 byte) then for each variable: id (1 byte) and value
+            bool 1 byte, int and float 4 bytes little endian,
+            str and JSON as 2 bytes of length followed by utf-8
+            an int beyond int32 turns its variable to JSON, see fit_code
+        base64 encoded, so the console stays text
+        values longer than MAX_VALUE_SIZE follow in a JSON frame
+        """
+        payload = bytearray(kind)
+        too_long = None
+        for i in ids:
+            data = self.encode_value(i)
+            if data is None:
+                if too_long is None:
+                    too_long = []
+                too_long.append(i)
+                continue
+            payload.append(i)
+            payload.extend(data)
+        frame = binascii.b2a_base64(payload)[:-1]  # no new line
+        self.output(CV_BINARY_START + frame.decode() + CV_BINARY_END)
+        if too_long is not None:
+            self.output(self.encode_json(too_long))
 
 
     def heart_beat(self):
+        """
+        call every loop, input is read on every call within the budget,
+        variables are sent every UPDATE_PERIOD
+        """
+        self.serial_read()
         if time.monotonic() - self.last_time_stamp > UPDATE_PERIOD:
-            self.update()
+            self.send_changes()
             self.last_time_stamp = time.monotonic()
 
+    def remaining(self):
+        """
+        seconds until the next heart beat, 0 with input waiting
+        """
+        if self.bytes_available():
+            return 0
+        return max(0, self.last_time_stamp + UPDATE_PERIOD - time.monotonic())
+
     def exit_action (self, text, branch):
+        """
+        apply a host update frame, in one pass over its items
+        unknown names and values that do not cast are skipped and counted
+        the applied ones are echoed
+        """
+        self.frames += 1
+        # parse
         try:
-            # parse
-            serial_updates_dict = json.loads(branch.strip())
-            # check
-            assert all(
-                [key in self.vars for key in serial_updates_dict]
-            ), "get unknown variable names from serial"
-            # cast type 
-            for key, value in serial_updates_dict.items():
-                serial_updates_dict[key] = type(self.vars[key])(value)
-            # echo update
-            print(CV_JSON_START + json.dumps(serial_updates_dict) + CV_JSON_END, end='')
+            serial_updates_dict = json.loads(str(branch, 'utf-8'))
+        except (ValueError, UnicodeError):
+            self.bad_frames += 1
+            return
+        if type(serial_updates_dict) is not dict:
+            self.bad_frames += 1
+            return
+        schema = self.schema
+        echo = []
+        for key, value in serial_updates_dict.items():
+            entry = schema.get(key)
+            if entry is None:
+                if key == MODE_KEY:
+                    self.set_mode(value == "binary")
+                else:
+                    self.unknown_names += 1
+                continue
+            i, caster = entry
+            # cast type
+            try:
+                value = caster(value)
+            except (ValueError, TypeError, OverflowError):
+                # e.g. int(1e999), no host input may stop the loop
+                self.bad_values += 1
+                continue
             # update
-            self.vars.update(serial_updates_dict)
-        except Exception as e:
-            self.serial_updates = ""  # clean up bad data
-            print(e)
+            self.fit_code(i, value)
+            self.vars[key] = value
+            self.version += 1
+            self.versions[i] = self.version
+            echo.append(i)
+        # echo update
+        if echo:
+            self.send_ids(echo)
 
-    def define(self, var_name, initdata):
+    def define(self, var_name, initdata, period=0):
         """
         define a connected variable
+        period: min seconds between two heartbeats sending it,
+            changes in between are sent later, write() always sends
+        a list or dict value changed in place is sent by the next heartbeat
+        in binary mode, a new or retyped variable sends the schema again
         """
         assert type(var_name) == type(""), "var_name should be string"
+        if var_name not in self.vars:
+            assert len(self.names) < 256, "too many variables for binary mode"
+            self.ids[var_name] = len(self.names)
+            self.names.append(var_name)
+            self.codes.append(None)
+            self.types.append(None)
+            self.keys.append(json.dumps(var_name) + ": ")
+            self.versions.append(0)
+            self.acked.append(-1)  # never sent
+            self.periods.append(0)
+            self.sent_time.append(-period)
+            self.sent_json.append(None)
         self.vars[var_name] = initdata
+        code = type_code(initdata)
+        if code != self.codes[self.ids[var_name]]:
+            self.codes[self.ids[var_name]] = code
+            if self.binary:
+                self.send_schema()
+        self.types[self.ids[var_name]] = type(initdata)
+        self.schema[var_name] = (self.ids[var_name], type(initdata))
+        self.periods[self.ids[var_name]] = period
+        self.touch(var_name)
 
     def serial_read(self):
         """
         read CDC data from serial buffer if any
+        at most RX_BUDGET_BYTES and about RX_BUDGET_NS per call
         don't use input() in other parts of the code
         """
+        budget = RX_BUDGET_BYTES
+        deadline = time.monotonic_ns() + RX_BUDGET_NS
         # read from serial
-        while n_bytes := supervisor.runtime.serial_bytes_available:
-            self.cv_processor.push([sys.stdin.read(n_bytes)])
+        while budget > 0 and (n_bytes := self.bytes_available()):
+            n_bytes = min(n_bytes, RX_BUFFER_SIZE, budget)
+            if self.serial is None:
+                # console without usb_cdc
+                self.cv_processor.push([sys.stdin.read(n_bytes).encode()])
+            else:
+                n_bytes = self.serial.readinto(self.rx_view[:n_bytes])
+                self.cv_processor.push([self.rx_view[:n_bytes]])
+            budget -= n_bytes
+            if time.monotonic_ns() > deadline:
+                break
+
+    def rx_stats(self):
+        """
+        counters of received frames
+        dropped: longer than MAX_FRAME_SIZE
+        truncated: cut by a new <CV> before their </CV>
+        bad: not utf-8 or not a JSON object
+        unknown_names, bad_values: items skipped in frames
+        """
+        return {
+            "frames": self.frames,
+            "dropped": self.cv_processor.dropped,
+            "truncated": self.cv_processor.interrupted,
+            "bad": self.bad_frames,
+            "unknown_names": self.unknown_names,
+            "bad_values": self.bad_values,
+        }
+
+    def bytes_available(self):
+        if self.console:
+            return supervisor.runtime.serial_bytes_available
+        return self.serial.in_waiting
 
     def read(self, var_names):
         """
@@ -80,21 +459,34 @@ class ConnectedVariables:
         return output
 
     def write(self, var_names, var_values):
+        """
+        set defined variables and send them, at the end of a batch
+        a list or dict changed in place needs no write,
+        the next heartbeat finds and sends it
+        """
         # type enforce
         if type(var_names) != type([]):
             var_names = [var_names]
             var_values = [var_values]
-        assert all(
-            [type(name) == type("") for name in var_names]
-        ), "all names should be strings in python"
-        assert all(
-            [
-                type(self.vars[name]) == type(value)
-                for name, value in zip(var_names, var_values)
-            ]
-        ), "variable type does not match in python"
-        # update
-        updates_dict = {name: value for name, value in zip(var_names, var_values)}
-        self.vars.update(updates_dict)
+        # check all before changing any
+        for name, value in zip(var_names, var_values):
+            assert type(name) is str, "all names should be strings in python"
+            i = self.ids[name]
+            assert type(value) is self.types[i], "variable type does not match in python"
+        for name, value in zip(var_names, var_values):
+            i = self.ids[name]
+            # update
+            self.fit_code(i, value)
+            self.vars[name] = value
+            self.version += 1
+            self.versions[i] = self.version
+            self.pending[i] = None
         # send updates
-        print(CV_JSON_START + json.dumps(updates_dict) + CV_JSON_END, end='')
\ No newline at end of file
+        if not self.batching:
+            self.flush()
+
+    def send(self, updates_dict):
+        """
+        send updated variables in the current mode
+        """
+        self.send_ids([self.ids[name] for name in updates_dict])
\ No newline at end of file
@@ -18,82 +18,314 @@ class State:
 
 
 class TargetMatcher:
+    """
+    Find a target string in a stream of segments
+    KMP automaton, the match state is carried across pushes,
+    so each character is scanned once and the part of the target
+    at the end of a segment is held back until the next push.
+    Runs without a partial match are searched with find().
+    """
     def __init__(self, target=None):
         if target is None:
             self.clear_target()
         else:
             self.target = target
-        self.segment = ""
         self.mood = State()
 
+    @property
+    def target(self):
+        return self._target
+
+    @target.setter
+    def target(self, target):
+        self._target = target
+        # failure table, length of the longest proper prefix
+        # that is also a suffix of target[:i + 1]
+        self.fail = [0] * len(target)
+        k = 0
+        for i in range(1, len(target)):
+            while k and target[i] != target[k]:
+                k = self.fail[k - 1]
+            if target[i] == target[k]:
+                k += 1
+            self.fail[i] = k
+        # number of target characters matched at the end of the stream
+        self.matched = 0
+
+    @property
+    def segment(self):
+        """ held back text """
+        return self._target[:self.matched]
+
     def push(self, segment):
         result = []
-        segment = self.segment + segment
-        self.segment = ''
-        for i in range(len(segment) - len(self.target), len(segment)):
-            if i < 0:
-                continue
-            tail = segment[i:]
-            if tail == self.target:
-                break
-            if tail == self.target[:len(tail)]:
-                self.segment = tail
-                segment = segment[:len(segment) - len(tail)]
-                break
-            else:
-                self.segment = ""
-        parts = segment.split(self.target)
-        for i in range(len(parts)):
-            if i != 0:
-                self.mood.now = 1
-                result.append([self.target, self.mood.now, self.mood.diff])
-            if len(parts[i]) > 0:
-                self.mood.now = 0
-                result.append([parts[i], self.mood.now, self.mood.diff])
+        target = self._target
+        fail = self.fail
+        m = len(target)
+        held = self.matched
+        mood = self.mood.now
+        j = held
+        # first position not yet in the result
+        # negative positions are the held back target[:held]
+        start = -held
+        i = 0
+        n = len(segment)
+        searching = True  # a full match may follow
+        while i < n:
+            if j == 0 and searching:
+                # nothing held, jump to the next full match
+                begin = segment.find(target, i)
+                if begin < 0:
+                    # only the tail can hold the start of a target
+                    searching = False
+                    i = max(i, n - m + 1)
+                    if i >= n:
+                        break
+            if j or not searching:
+                c = segment[i]
+                while j and c != target[j]:
+                    j = fail[j - 1]
+                if c == target[j]:
+                    j += 1
+                i += 1
+                if j < m:
+                    continue
+                begin = i - m
+                j = 0
+            # target found at begin
+            if begin > start:
+                result.append([self.text(segment, held, start, begin), 0, -mood])
+                mood = 0
+            result.append([target, 1, 1 - mood])
+            mood = 1
+            start = i = begin + m
+        end = n - j
+        if end > start:
+            result.append([self.text(segment, held, start, end), 0, -mood])
+            mood = 0
+        self.mood.now = mood
+        self.matched = j
         return result
 
+    def text(self, segment, held, start, end):
+        if start >= 0:
+            return segment[start:end]
+        if end <= 0:
+            return self._target[held + start:held + end]
+        # held back characters turned out not to be the target
+        return self._target[held + start:held] + segment[:end]
+
     def clear_target(self):
         self.target = 'You shall not pass! (∩๏‿‿๏)⊃━☆ﾟ.*'
 
 
-class BracketMatcher:
-    def __init__(self, begin_str, end_str):
-        self.begin_matcher = TargetMatcher(begin_str)
-        self.end_matcher = TargetMatcher(end_str)
-        self.mood = State()
-        self.matcher = self.begin_matcher
+class MultiTargetMatcher:
+    """
+    Find several target strings in a stream of segments at once
+    Aho-Corasick automaton, the match state is carried across pushes,
+    so each character is scanned once.
+    push returns [text, index] parts
+        index is the index of the matched target, -1 for text between targets
+    bytes targets work on bytes-like segments, e.g. memoryview,
+        text parts are then slices of the segment, valid until it is reused
+    """
+    def __init__(self, targets):
+        self.targets = targets
+        self.binary = not isinstance(targets[0], str)
+        # trie
+        self.goto = [{}]
+        self.prefix = [targets[0][:0]]
+        self.out = [-1]
+        for k in range(len(targets)):
+            target = targets[k]
+            node = 0
+            for d in range(len(target)):
+                c = target[d]
+                if c not in self.goto[node]:
+                    self.goto.append({})
+                    self.prefix.append(target[:d + 1])
+                    self.out.append(-1)
+                    self.goto[node][c] = len(self.goto) - 1
+                node = self.goto[node][c]
+            self.out[node] = k
+        # failure links, breadth first
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        while queue:
+            node = queue.pop(0)
+            for c, child in self.goto[node].items():
+                if node:
+                    f = self.fail[node]
+                    while f and c not in self.goto[f]:
+                        f = self.fail[f]
+                    self.fail[child] = self.goto[f].get(c, 0)
+                if self.out[child] < 0:
+                    # a shorter target ending here
+                    self.out[child] = self.out[self.fail[child]]
+                queue.append(child)
+        # all targets share the first character, e.g. '<'
+        firsts = list(self.goto[0].keys())
+        self.first = firsts[0] if len(firsts) == 1 else None
+        self.node = 0
+
+    def push(self, segment):
+        result = []
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        # memoryview has no find()
+        first = self.first if hasattr(segment, 'find') else None
+        held = self.prefix[self.node]
+        node = self.node
+        # first position not yet in the result
+        # negative positions are the held back characters
+        start = -len(held)
+        i = 0
+        n = len(segment)
+        while i < n:
+            if node == 0 and first is not None:
+                # skip to the next possible start of a target
+                i = segment.find(first, i)
+                if i < 0:
+                    break
+            c = segment[i]
+            while node and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            i += 1
+            k = out[node]
+            if k >= 0:
+                begin = i - len(self.targets[k])
+                if begin > start:
+                    result.append([self.text(segment, held, start, begin), -1])
+                result.append([self.targets[k], k])
+                start = i
+                node = 0
+        end = n - len(self.prefix[node])
+        if end > start:
+            result.append([self.text(segment, held, start, end), -1])
+        self.node = node
+        return result
+
+    def text(self, segment, held, start, end):
+        if start >= 0:
+            return segment[start:end]
+        if end <= 0:
+            return held[len(held) + start:len(held) + end]
+        # held back characters turned out not to be a target
+        if self.binary:
+            return held[len(held) + start:] + bytes(segment[:end])
+        return held[len(held) + start:] + segment[:end]
+
+
+# policies of MultiBracketMatcher on an open tag inside a bracket
+LITERAL = 0  # keep it as text of the current bracket
+NEST = 1  # same as LITERAL, but the same pair nests and needs its own close tag
+RESTART = 2  # close the current bracket and open the new one
+
+
+class MultiBracketMatcher:
+    """
+    Split a stream into text inside and outside of several tag pairs
+    with one scan of the input
+    pairs: list of (open tag, close tag)
+    policy: LITERAL, NEST or RESTART, for open tags inside a bracket
+        close tags outside of their bracket are always text
+    push returns [text, mood, diff, pair] parts
+        mood is 1 inside a bracket, diff is the change of mood
+        pair is the index of the current or the last bracket
+        the tags are not in the output,
+        an empty text part marks entering (diff 1) and leaving (diff -1)
+        with RESTART, leaving an interrupted bracket has a fifth item, True
+    """
+    def __init__(self, pairs, policy=LITERAL):
+        self.pairs = pairs
+        self.policy = policy
+        targets = []
+        for pair in pairs:
+            for tag in pair:
+                if tag not in targets:
+                    targets.append(tag)
+        # pairs opened and closed by each tag
+        self.opens = [
+            [p for p in range(len(pairs)) if pairs[p][0] == tag] for tag in targets
+        ]
+        self.closes = [
+            [p for p in range(len(pairs)) if pairs[p][1] == tag] for tag in targets
+        ]
+        self.matcher = MultiTargetMatcher(targets)
+        self.binary = self.matcher.binary
+        self.empty = targets[0][:0]
+        self.mood = 0
+        self.last = 0
+        self.pair = 0
+        self.depth = 0
 
     def push(self, segment):
         outlet = []
-        parts = self.matcher.push(segment)
-        while len(parts) > 0:
-            current = parts.pop(0)
-            if len(current[0]) == 0:
-                continue
-            if current[1] == 0:
-                outlet.append([current[0], self.mood.now, self.mood.diff])
-                self.mood.now = self.mood.now
-            else:
-                self.mood.now = 1 - self.mood.now
-                if self.mood.now == 1:
-                    self.matcher = self.end_matcher
-                else:
-                    self.matcher = self.begin_matcher
-                rest = [p[0] for p in parts]
-                text = ''.join(rest)
-                parts = self.matcher.push(text)
+        for text, k in self.matcher.push(segment):
+            if k >= 0:
+                opens = self.opens[k]
+                if self.mood == 1 and self.pair in self.closes[k]:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        self.mood = 0
+                        outlet.append([self.empty, 0, -1, self.pair])
+                        self.last = 0
+                        continue
+                elif opens and self.mood == 0:
+                    self.enter(outlet, opens[0])
+                    continue
+                elif opens and self.policy == RESTART:
+                    outlet.append([self.empty, 0, -1, self.pair, True])
+                    self.enter(outlet, opens[0])
+                    continue
+                elif self.pair in opens and self.policy == NEST:
+                    self.depth += 1
+            # text, or a tag kept as text
+            outlet.append([text, self.mood, self.mood - self.last, self.pair])
+            self.last = self.mood
         return outlet
 
+    def enter(self, outlet, pair):
+        self.mood = 1
+        self.pair = pair
+        self.depth = 1
+        outlet.append([self.empty, 1, 1, pair])
+        self.last = 1
+
+
+class BracketMatcher(MultiBracketMatcher):
+    """
+    Split a stream into text inside and outside of one tag pair
+    """
+    def __init__(self, begin_str, end_str, policy=LITERAL):
+        super().__init__([(begin_str, end_str)], policy=policy)
+
 def none_fun (text, branch):
     return None
 
 class MatcherProcessor:
+    """
+    Call actions on the parts of a bracket matcher
+    actions are called as action(text, branch)
+        branch is the text collected inside the current bracket,
+        it is only built for actions that are not none_fun
+    With a bytes matcher, the branch is collected in a preallocated bytearray
+    and decoded to str only when passed to an action,
+    or passed as bytes with decode=False, for actions that check the encoding.
+    A bracket is dropped, without exit_action, when it is interrupted
+    by a RESTART or longer than max_branch, counted in interrupted and dropped.
+    """
     def __init__(self, 
         matcher, 
         in_action=none_fun,
         enter_action=none_fun,
         exit_action=none_fun,
-        out_action=none_fun
+        out_action=none_fun,
+        branch_size=256,
+        max_branch=None,
+        decode=True,
     ):
         self.matcher = matcher
         self.in_action = in_action
@@ -101,7 +333,52 @@ class MatcherProcessor:
         self.exit_action = exit_action
         self.out_action = out_action
         self.through = False
-        self.branch = []
+        self.binary = getattr(matcher, 'binary', False)
+        self.decode = decode
+        if self.binary:
+            self.branch = bytearray(branch_size)
+        else:
+            self.branch = []
+        self.branch_len = 0
+        self.pair = 0
+        self.max_branch = max_branch
+        self.overflow = False
+        self.dropped = 0
+        self.interrupted = 0
+
+    def branch_text(self, action):
+        if action is none_fun:
+            return ''
+        if self.binary:
+            if not self.decode:
+                return bytes(self.branch[:self.branch_len])
+            return str(self.branch[:self.branch_len], 'utf-8')
+        return ''.join(self.branch)
+
+    def collect(self, text):
+        if self.overflow:
+            return
+        end = self.branch_len + len(text)
+        if self.max_branch is not None and end > self.max_branch:
+            # too long, skip the rest until the bracket ends
+            self.overflow = True
+            self.clear()
+            return
+        if not self.binary:
+            self.branch.append(text)
+            self.branch_len = end
+            return
+        if end > len(self.branch):
+            # grow, rare
+            size = max(end, 2 * len(self.branch))
+            self.branch.extend(bytearray(size - len(self.branch)))
+        self.branch[self.branch_len:end] = text
+        self.branch_len = end
+
+    def clear(self):
+        if not self.binary:
+            self.branch = []
+        self.branch_len = 0
 
     def push(self, parts):
         outlet = []
@@ -110,20 +387,29 @@ class MatcherProcessor:
                 text = part_out[0]
                 mood = part_out[1]
                 diff = part_out[2]
+                if len(part_out) > 3:
+                    # bracket of a MultiBracketMatcher
+                    self.pair = part_out[3]
                 
                 # print('debug', part_out)
                 if diff == 1:
-                    self.enter_action(text, ''.join(self.branch))
+                    self.enter_action(text, self.branch_text(self.enter_action))
                 if mood == 1:
-                    self.in_action(text, ''.join(self.branch))
+                    self.in_action(text, self.branch_text(self.in_action))
                     if self.through:
                         outlet.append(text)
                     else:
-                        self.branch.append(text)
+                        self.collect(text)
                 if diff == -1:
-                    self.exit_action(text, ''.join(self.branch))
-                    self.branch = []
+                    if len(part_out) > 4:
+                        self.interrupted += 1
+                    elif self.overflow:
+                        self.dropped += 1
+                    else:
+                        self.exit_action(text, self.branch_text(self.exit_action))
+                    self.overflow = False
+                    self.clear()
                 if mood == 0:
-                    self.out_action(text, ''.join(self.branch))
+                    self.out_action(text, self.branch_text(self.out_action))
                     outlet.append(text)
-        return outlet
\ No newline at end of file
+        return outlet
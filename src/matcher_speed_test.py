@@ -0,0 +1,82 @@
+"""
+Throughput of TargetMatcher on a long serial stream
+compared with the previous slicing and split based matcher
+run on the host with CPython or on the board, from the lib folder
+"""
+import sys
+from time import monotonic
+
+sys.path.append("lib")
+from matcher import TargetMatcher, State
+
+
+class SplitTargetMatcher:
+    """
+    the previous TargetMatcher, for comparison
+    """
+    def __init__(self, target):
+        self.target = target
+        self.segment = ""
+        self.mood = State()
+
+    def push(self, segment):
+        result = []
+        segment = self.segment + segment
+        self.segment = ''
+        for i in range(len(segment) - len(self.target), len(segment)):
+            if i < 0:
+                continue
+            tail = segment[i:]
+            if tail == self.target:
+                break
+            if tail == self.target[:len(tail)]:
+                self.segment = tail
+                segment = segment[:len(segment) - len(tail)]
+                break
+            else:
+                self.segment = ""
+        parts = segment.split(self.target)
+        for i in range(len(parts)):
+            if i != 0:
+                self.mood.now = 1
+                result.append([self.target, self.mood.now, self.mood.diff])
+            if len(parts[i]) > 0:
+                self.mood.now = 0
+                result.append([parts[i], self.mood.now, self.mood.diff])
+        return result
+
+
+def merged(parts):
+    """ join neighbouring text parts, they may be split differently """
+    out = []
+    for text, mood, diff in parts:
+        if out and mood == 0 and out[-1][1] == 0:
+            out[-1][0] += text
+        else:
+            out.append([text, mood])
+    return out
+
+
+MB = 2  # size of the stream in megabytes
+
+frame = '<CV>{"x": 0.25, "y": -0.5, "name": "<CV "}</CV>log line < not a tag\n'
+stream = frame * (MB * 2**20 // len(frame))
+
+# same parts on an awkward chunking
+for size in [1, 2, 3, 5, 7, 64]:
+    new, old = TargetMatcher("<CV>"), SplitTargetMatcher("<CV>")
+    new_parts, old_parts = [], []
+    for i in range(0, 2000, size):
+        new_parts += new.push(stream[i:i + size])
+        old_parts += old.push(stream[i:i + size])
+    assert merged(new_parts) == merged(old_parts), size
+print("same result")
+
+for size in [64, 4096]:  # bytes per push, a serial read and a full buffer
+    chunks = [stream[i:i + size] for i in range(0, len(stream), size)]
+    for matcher in [TargetMatcher("<CV>"), SplitTargetMatcher("<CV>")]:
+        start_time = monotonic()
+        for chunk in chunks:
+            matcher.push(chunk)
+        duration = monotonic() - start_time
+        print(type(matcher).__name__, size, "bytes per push:", MB / duration, "MB/s")
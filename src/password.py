@@ -15,6 +15,7 @@ Date updated: 2022/06/21 (YYYY/MM/DD)
 import board
 
 #%% buzzer
+# tones are played by buzzer.update(), independent of the frame rate
 from driver import Buzzer
 buzzer = Buzzer(board.D10)
 
@@ -51,27 +52,30 @@ HEIGHT = 64
 display = adafruit_displayio_ssd1306.SSD1306(display_bus, width=WIDTH, height=HEIGHT, rotation=180)
 
 #%% USB HID
-import usb_hid
-from adafruit_hid.keyboard import Keyboard
-from adafruit_hid.mouse import Mouse
-
-while True:
-    try:
-        # Keep trying connect to USB untill success
-        # This useful for computer log in after boot.
-        mouse = Mouse(usb_hid.devices)
-        keyboard = Keyboard(usb_hid.devices)
-        break
-    except:
-        print('\n' * 10 + 'USB not ready\nPlease Wait')
+# actions are queued and sent by hid.drain() once USB is ready
+# so the device boots without waiting for the computer to log in
+from hid_output import HidQueue
+hid = HidQueue()
+mouse = hid.mouse
+keyboard = hid.keyboard
 
 #%% Background apps
-from background import FpsControl, FpsMonitor, NumLocker, MouseJitter
+from background import (
+    AdaptiveFps, FpsMonitor, NumLocker, MouseJitter, BackgroundRegistry, Top
+)
 
-frame_app = FpsControl(fps=30)
-fpsMonitor_app = FpsMonitor(period=10, fps_app=frame_app)
+background = BackgroundRegistry()
+# 60 FPS while touched, 30 FPS in use, 4 FPS after 30 s without touch
+frame_app = AdaptiveFps(wheel_phy, fps=30, boost_fps=60, idle_fps=4, idle_time=30)
+fpsMonitor_app = background.add(FpsMonitor(period=10, fps_app=frame_app))
 num_app = NumLocker(keyboard=keyboard)
-mouse_app = MouseJitter(mouse=mouse, period=60)
+# background.add(num_app)  # For Windows Only
+mouse_app = background.add(MouseJitter(mouse=mouse, period=60))
+# background.add(Top(period=60, registry=background))  # time spent by each app
+
+# sleep between frames until the next deadline
+from timetrigger import Scheduler
+scheduler = Scheduler([frame_app, background, hid, buzzer])
 
 #%% apps
 from application import MasterKey, AccountList, Item, ClickWheelTest
@@ -88,16 +92,18 @@ app.display(display, buzzer)
 print('init done')
 while True:
     # Background procedures
-    fpsMonitor_app()
-    mouse_app()
-    # num_app()  # For Windows Only
+    buzzer.update()
+    hid.drain()
+    background()
 
     # FPS control
-    if not frame_app():
+    if not background.run(frame_app):
+        scheduler.sleep()
         continue
 
     # input
     event = navi_events.get()
+    frame_app.update(navi_events.any.now, event)
 
     # logic
     if event is not None:
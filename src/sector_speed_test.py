@@ -0,0 +1,47 @@
+"""
+Compare the direction detection of TouchWheelNavigationEvents
+- theta_diff: atan2 then four theta_diff calls (the original path)
+- SectorClassifier: pseudo angle lookup, no trigonometry
+"""
+from time import monotonic
+from math import atan2, pi, cos, sin
+from touchwheel import theta_diff, SectorClassifier
+
+T = 2000  # samples per run
+
+thr_rad = 45 / 180 * pi
+centers = [0, pi / 2, pi, -pi / 2]  # right, up, left, down
+samples = []
+for i in range(T):
+    theta = 2 * pi * i / T + 0.001
+    r = 0.3 + 0.7 * (i % 7) / 7
+    samples.append((r * cos(theta), r * sin(theta)))
+
+
+def by_theta_diff(x, y):
+    theta = atan2(y, x)
+    for k in range(4):
+        if abs(theta_diff(centers[k], theta)) < thr_rad:
+            return k
+    return -1
+
+
+for N in [4, 8, 12]:
+    sectors = SectorClassifier(N)
+    if N == 4:
+        # results should be identical to the original path
+        sectors = SectorClassifier(4, width=2 * thr_rad)
+        mismatch = sum(
+            [by_theta_diff(x, y) != sectors.classify(x, y) for x, y in samples]
+        )
+        print("mismatch:", mismatch)
+
+        start_time = monotonic()
+        for x, y in samples:
+            by_theta_diff(x, y)
+        print("theta_diff:", monotonic() - start_time)
+
+    start_time = monotonic()
+    for x, y in samples:
+        sectors.classify(x, y)
+    print("SectorClassifier N =", N, ":", monotonic() - start_time)
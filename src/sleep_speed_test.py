@@ -0,0 +1,57 @@
+"""
+Duty cycle of the main loop, spinning until the next frame versus
+sleeping until the next deadline with Scheduler
+- frames per second, should be the same
+- duty cycle, process time over wall time, on the host with CPython
+the wheel is simulated, frames run the navigation events on demo_trace
+"""
+import time
+from timetrigger import Repeat, Scheduler
+from touchwheel import TouchWheelPhysics, TouchWheelNavigationEvents
+from touchwheel_sim import SimulatedWheel, demo_trace, PAD_MAX, PAD_MIN
+
+DURATION = 3  # seconds per run
+FPS = 30
+trace = demo_trace(600)
+
+
+def run(use_sleep):
+    sim = SimulatedWheel()
+    phy = TouchWheelPhysics(
+        pads=sim.pads, geometry=sim.geometry, pad_max=PAD_MAX, pad_min=PAD_MIN
+    )
+    events = TouchWheelNavigationEvents(phy, N=10)
+    frame = Repeat(FPS)
+    monitor = Repeat(1)  # a background task
+    scheduler = Scheduler([frame, monitor])
+    frames = 0
+    loops = 0
+    start_time = time.monotonic()
+    start_cpu = time.process_time()
+    while time.monotonic() - start_time < DURATION:
+        loops += 1
+        monitor.check()
+        if not frame.check():
+            if use_sleep:
+                scheduler.sleep()
+            continue
+        theta, r, noise = trace[frames % len(trace)]
+        sim.touch(theta, r, noise)
+        events.get()
+        frames += 1
+    wall = time.monotonic() - start_time
+    cpu = time.process_time() - start_cpu
+    print(
+        "sleep" if use_sleep else "busy wait",
+        "FPS:",
+        round(frames / wall, 1),
+        "loops:",
+        loops,
+        "duty cycle:",
+        round(100 * cpu / wall, 1),
+        "%",
+    )
+
+
+run(False)
+run(True)
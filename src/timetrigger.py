@@ -2,7 +2,7 @@
 This script contains the classes for
 triggers related to time
 """
-from time import monotonic
+from time import monotonic, sleep
 
 # Timer class
 class Timer:
@@ -37,6 +37,13 @@ class Timer:
         self.enable = True
     def disable(self):
         self.enable = False
+    def remaining(self):
+        """
+        seconds until the timer is over, None when not started
+        """
+        if not self.enable:
+            return None
+        return max(0, self.start_time + self.duration - monotonic())
 
 class Repeat:
     """
@@ -58,3 +65,57 @@ class Repeat:
             return True
         else:
             return False
+    def remaining(self):
+        """
+        seconds until the next action
+        """
+        return self.timer.remaining()
+
+class Scheduler:
+    """
+    Sleep until the next deadline of a set of tasks
+    instead of spinning the main loop
+    tasks: objects with remaining(), seconds until due or None
+    max_sleep: longest sleep, keeps serial input and touch responsive
+    min_sleep: shorter waits are not worth a sleep
+    light_sleep: use alarm light sleep where available
+    """
+    def __init__(self, tasks=(), max_sleep=0.05, min_sleep=0.001, light_sleep=False):
+        self.tasks = list(tasks)
+        self.max_sleep = max_sleep
+        self.min_sleep = min_sleep
+        self.alarm = None
+        if light_sleep:
+            try:
+                import alarm
+                self.alarm = alarm
+            except ImportError:
+                pass
+        self.slept = 0  # seconds
+        self.sleeps = 0
+    def add(self, task):
+        self.tasks.append(task)
+        return task
+    def remaining(self):
+        out = self.max_sleep
+        for task in self.tasks:
+            t = task.remaining()
+            if t is not None and t < out:
+                out = t
+        return out
+    def sleep(self):
+        """
+        sleep until the next deadline, returns the seconds slept
+        """
+        t = self.remaining()
+        if t < self.min_sleep:
+            return 0
+        if self.alarm is not None:
+            self.alarm.light_sleep_until_alarms(
+                self.alarm.time.TimeAlarm(monotonic_time=monotonic() + t)
+            )
+        else:
+            sleep(t)
+        self.slept += t
+        self.sleeps += 1
+        return t
@@ -0,0 +1,81 @@
+# %% touch pads
+"""
+Touch pads read together, shared by driver.py and touchwheel.py
+"""
+from time import monotonic
+
+
+class TouchPads:
+    """
+    A set of touch pads read in one pass
+    pins: board pins, touchio.TouchIn are created for them
+    pads: or objects with raw_value, e.g. touchio.TouchIn
+    warmup: reads averaged into the per pad baseline, the raw value without touch
+        the baseline is built by the first reads, ready is True after them,
+        or at once by calibrate()
+    """
+
+    def __init__(self, pins=None, pads=None, warmup=4):
+        if pads is None:
+            import touchio
+
+            pads = [touchio.TouchIn(pin) for pin in pins]
+        self.pads = pads
+        n = len(pads)
+        self.raw = [0] * n
+        self.baseline = [0] * n
+        self.warmup = warmup
+        self.sums = [0] * n
+        self.count = 0
+        self.ready = False
+
+    def read(self):
+        """
+        read all pads into self.raw and return it
+        """
+        raw = self.raw
+        pads = self.pads
+        for i in range(len(pads)):
+            raw[i] = pads[i].raw_value
+        if not self.ready:
+            self.accumulate()
+        return raw
+
+    def accumulate(self):
+        raw = self.raw
+        sums = self.sums
+        for i in range(len(raw)):
+            sums[i] += raw[i]
+        self.count += 1
+        if self.count >= self.warmup:
+            for i in range(len(raw)):
+                self.baseline[i] = sums[i] // self.count
+            self.ready = True
+
+    def calibrate(self):
+        """
+        build the baseline now, without touch, in warmup passes over all pads
+        """
+        self.count = 0
+        self.ready = False
+        for i in range(len(self.sums)):
+            self.sums[i] = 0
+        while not self.ready:
+            self.read()
+        return self.baseline
+
+    def measure_range(self, duration=5):
+        """
+        min and max raw value of each pad for duration seconds
+        slide on the pads meanwhile
+        """
+        n = len(self.pads)
+        pad_max = [0] * n
+        pad_min = [100000] * n
+        start_time = monotonic()
+        while monotonic() - start_time < duration:
+            raw = self.read()
+            for i in range(n):
+                pad_max[i] = max(pad_max[i], raw[i])
+                pad_min[i] = min(pad_min[i], raw[i])
+        return pad_max, pad_min
@@ -1,6 +1,7 @@
 # %% clickwheel
-from math import sqrt, atan2, pi
-from time import monotonic, sleep
+from math import sqrt, atan2, pi, cos, sin
+from time import monotonic
+from touchpads import TouchPads
 
 
 class Timer:
@@ -83,18 +84,188 @@ def theta_diff(a, b):
     return c
 
 
+def pseudo_angle(x, y):
+    """
+    Monotonic stand-in for atan2, without trigonometry
+    0 at +x, increasing counter-clockwise, in range [0, 4)
+    """
+    if y >= 0:
+        if x >= 0:
+            s = x + y
+            return y / s if s else 0
+        return 1 - x / (y - x)
+    if x < 0:
+        return 2 - y / (-x - y)
+    return 3 + x / (x - y)
+
+
+class SectorClassifier:
+    """
+    Map (x, y) to one of N equally spaced sectors
+    sector k is centered at offset + k * 2 * pi / N
+    width: angular width of each sector, default fills the whole circle
+        points outside all sectors give -1
+    Boundaries are converted to pseudo angles once,
+    so classify() only uses sign tests, one division and comparisons.
+    """
+
+    def __init__(self, N, width=None, offset=0):
+        self.N = N
+        if width is None:
+            width = 2 * pi / N
+        self.lower = []
+        self.upper = []
+        for k in range(N):
+            lower = offset + k * 2 * pi / N - width / 2
+            upper = lower + width
+            self.lower.append(self.boundary(lower))
+            self.upper.append(self.boundary(upper))
+
+    def boundary(self, theta):
+        """
+        pseudo angle of a sector boundary at theta rad
+        """
+        return pseudo_angle(cos(theta), sin(theta))
+
+    def angle(self, x, y):
+        return pseudo_angle(x, y)
+
+    def classify(self, x, y):
+        a = self.angle(x, y)
+        for k in range(self.N):
+            lower = self.lower[k]
+            upper = self.upper[k]
+            if lower < upper:
+                if lower < a < upper:
+                    return k
+            elif a > lower or a < upper:
+                # sector wraps around the +x axis
+                return k
+        return -1
+
+
+class Filter:
+    """
+    Base class of the filters pluggable to State
+    dt: sample period in seconds, measured on every sample if None
+    """
+
+    def __init__(self, dt=None):
+        self.dt = dt
+        self.t = None
+
+    def step(self):
+        """
+        time since the last sample, 0 for the first one
+        """
+        if self.dt is not None:
+            if self.t is None:
+                self.t = 0
+                return 0
+            return self.dt
+        t = monotonic()
+        dt = 0 if self.t is None else t - self.t
+        self.t = t
+        return dt
+
+    def __call__(self, x, last):
+        """
+        x: new sample
+        last: the last output of the State
+        """
+        return x
+
+
+class LowPass(Filter):
+    """
+    1st-order low pass filter, alpha = 1 / 2**level
+    """
+
+    def __init__(self, level):
+        super().__init__()
+        self.alpha = 1 / 2**level
+
+    def __call__(self, x, last):
+        return x * self.alpha + last * (1 - self.alpha)
+
+
+class AlphaBeta(Filter):
+    """
+    Alpha-beta filter, a constant velocity Kalman filter with fixed gains
+    alpha: gain on position, larger follows the samples more closely
+    beta: gain on velocity, larger reacts to speed changes faster
+    """
+
+    def __init__(self, alpha=0.5, beta=0.1, dt=None):
+        super().__init__(dt)
+        self.alpha = alpha
+        self.beta = beta
+        self.x = 0
+        self.v = 0
+
+    def __call__(self, x, last):
+        dt = self.step()
+        if dt <= 0:
+            self.x = x
+            self.v = 0
+            return x
+        predict = self.x + self.v * dt
+        residual = x - predict
+        self.x = predict + self.alpha * residual
+        self.v += self.beta * residual / dt
+        return self.x
+
+
+class OneEuro(Filter):
+    """
+    One Euro filter
+    https://gery.casiez.net/1euro/
+    min_cutoff: cutoff frequency in Hz when still, lower for less jitter
+    beta: increase of cutoff with speed, higher for less lag
+    d_cutoff: cutoff frequency in Hz of the speed estimate
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0, dt=None):
+        super().__init__(dt)
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x = 0
+        self.dx = 0
+
+    @staticmethod
+    def smoothing(cutoff, dt):
+        tau = 1 / (2 * pi * cutoff)
+        return 1 / (1 + tau / dt)
+
+    def __call__(self, x, last):
+        dt = self.step()
+        if dt <= 0:
+            self.x = x
+            self.dx = 0
+            return x
+        a = self.smoothing(self.d_cutoff, dt)
+        self.dx = a * (x - self.x) / dt + (1 - a) * self.dx
+        a = self.smoothing(self.min_cutoff + self.beta * abs(self.dx), dt)
+        self.x = a * x + (1 - a) * self.x
+        return self.x
+
+
 class State:
     def __init__(
-        self, filter_level=None, relay_thr=None, id=None
+        self, filter_level=None, relay_thr=None, id=None, filter=None
     ):
+        """
+        filter_level: use a LowPass filter of this level
+        filter: a Filter object, used instead of filter_level
+        """
         self.id = id
         self._now = 0
         self.last = 0
-        if filter_level is not None:
-            self.use_filter = True
-            self.alpha = 1 / 2**filter_level
-        else:
-            self.use_filter = False
+        if filter is None and filter_level is not None:
+            filter = LowPass(filter_level)
+        self.filter = filter
+        self.use_filter = filter is not None
         if relay_thr is not None:
             self.use_relay = True
             self.relay = Relay(relay_thr)
@@ -108,9 +279,9 @@ class State:
     @now.setter
     def now(self, new):
         self.last = self._now
-        # low pass filter
+        # filter
         if self.use_filter:
-            new = new * self.alpha + self._now * (1 - self.alpha)
+            new = self.filter(new, self._now)
         # Relay
         diff = new - self.last
         new = self.last + (self.relay(diff) if self.use_relay else diff)
@@ -144,7 +315,7 @@ class EventQueue:
 
 class Event:
     def __init__(self, name, val):
-        if name in ["press", "release", "dial", "long"]:
+        if name in ["press", "release", "dial", "long", "scroll"]:
             self.name = name
         else:
             raise Exception("bad event ID")
@@ -154,19 +325,78 @@ class Event:
         return "name: " + self.name + ", val: " + str(self.val)
 
 
+class DialAcceleration:
+    """
+    Gain on dial steps from the angular speed
+    curve: (speed, gain) pairs in increasing speed, speed in rad/s
+        the gain of the last pair whose speed is reached is applied
+    window: number of theta samples the speed is measured over
+    """
+
+    def __init__(self, curve=((0, 1), (6, 2), (12, 4)), window=5):
+        self.curve = curve
+        self.window = window
+        # ring buffers of unwrapped angle and time
+        self.thetas = [0] * window
+        self.times = [0] * window
+        self.reset()
+
+    def reset(self):
+        self.ind = 0
+        self.count = 0
+        self.theta = 0
+
+    def push(self, theta_d):
+        self.theta += theta_d
+        self.thetas[self.ind] = self.theta
+        self.times[self.ind] = monotonic()
+        self.ind = (self.ind + 1) % self.window
+        if self.count < self.window:
+            self.count += 1
+
+    @property
+    def speed(self):
+        if self.count < 2:
+            return 0
+        newest = self.ind - 1
+        oldest = self.ind - self.count
+        dt = self.times[newest] - self.times[oldest]
+        if dt <= 0:
+            return 0
+        return abs(self.thetas[newest] - self.thetas[oldest]) / dt
+
+    @property
+    def gain(self):
+        speed = self.speed
+        out = 1
+        for threshold, gain in self.curve:
+            if speed >= threshold:
+                out = gain
+        return out
+
+
 class Dial:
-    def __init__(self, N):
+    def __init__(self, N, accel=None):
         self.N = N
         self.changed = False
+        self.accel = accel
 
     def reset(self, theta):
         self.theta_residual = 0
         self.theta_d = 0
         self.theta_last = theta
         self.changed = False
+        if self.accel is not None:
+            self.accel.reset()
+
+    def step(self, theta):
+        """
+        change of angle since the last update
+        """
+        return theta_diff(theta, self.theta_last)
 
     def update(self, theta):
-        self.theta_d = theta_diff(theta, self.theta_last)
+        self.theta_d = self.step(theta)
         self.theta_residual += self.theta_d
         dial = 0
         while self.theta_residual > pi / self.N:
@@ -175,39 +405,133 @@ class Dial:
         while self.theta_residual < -pi / self.N:
             self.theta_residual += 2 * pi / self.N
             dial += 1
+        if self.accel is not None:
+            self.accel.push(self.theta_d)
+            dial *= self.accel.gain
         if dial:
             self.changed = True
         self.theta_last = theta
         return dial
 
 
+class WheelGeometry:
+    """
+    Layout of the touch pads on a wheel
+    pads: one (angle, radius, weight) for each pad
+        angle: degree, counter-clockwise from the right (+x)
+        radius: 1 for pads on the ring, 0 for the center pad
+        weight: contribution of the pad to the vector sum
+    """
+
+    def __init__(self, pads):
+        self.pads = pads
+        self.N = len(pads)
+        # indices of the pads on the ring, in counter-clockwise order
+        self.ring = sorted(
+            [i for i in range(self.N) if pads[i][1] > 0],
+            key=lambda i: pads[i][0] % 360,
+        )
+
+    def projection(self, pad_max, pad_min):
+        """
+        precompute the flat coefficient array [kx0, ky0, kz0, kx1, ...]
+        and the offsets [x0, y0, z0] for given pad ranges, so that
+            x = sum(raw_value[i] * kx[i]) - x0
+        """
+        coef = []
+        offset = [0, 0, 0]
+        for i in range(self.N):
+            angle, radius, weight = self.pads[i]
+            scale = weight / (pad_max[i] - pad_min[i])
+            k = [
+                radius * cos(angle / 180 * pi) * scale,
+                radius * sin(angle / 180 * pi) * scale,
+                scale,
+            ]
+            for j in range(3):
+                if abs(k[j]) < 1e-12 * abs(scale):
+                    k[j] = 0  # exact zero for pads on the axes
+                coef.append(k[j])
+                offset[j] += pad_min[i] * k[j]
+        return coef, offset
+
+
+def ring_geometry(N, center=True, offset=0):
+    """
+    Geometry of N equally spaced pads on the ring,
+    the first one at offset degree,
+    followed by a center pad if center is True
+    """
+    pads = [(offset + 360 * i / N, 1, 1) for i in range(N)]
+    if center:
+        pads.append((0, 0, 1))
+    return WheelGeometry(pads)
+
+
+# up, down, left, right, center
+FIVE_PAD = WheelGeometry(
+    [(90, 1, 1), (270, 1, 1), (180, 1, 1), (0, 1, 1), (0, 0, 1)]
+)
+
+
+class Sample:
+    """
+    Output record of TouchWheelPhysics, updated in place every frame
+    """
+
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+        self.z = 0
+        self.r = 0
+        self.theta = 0
+        self.theta_fine = 0
+        self.theta_d = 0
+
+
 class TouchWheelPhysics:
     def __init__(
         self,
-        up,
-        down,
-        left,
-        right,
-        center,
+        up=None,
+        down=None,
+        left=None,
+        right=None,
+        center=None,
         pad_max=None,
         pad_min=None,
+        pads=None,
+        geometry=None,
+        fine_angle=False,
+        make_filter=None,
     ):
+        """
+        pads: list of objects with raw_value, or a TouchPads,
+            instead of up, down, left, right and center
+        geometry: WheelGeometry of the pads, required with pads,
+            FIVE_PAD by default for up, down, left, right and center
+        make_filter: function returning a new Filter for each of x, y and z,
+            e.g. lambda: OneEuro(min_cutoff=1, beta=0.5)
+            a LowPass of filter_level by default
+        """
         # touch pads
-        self.pads = [up, down, left, right, center]
+        if pads is None:
+            pads = [up, down, left, right, center]
+            if geometry is None:
+                geometry = FIVE_PAD
+        elif geometry is None:
+            raise ValueError("geometry is required with pads, e.g. ring_geometry(4)")
+        if not isinstance(pads, TouchPads):
+            pads = TouchPads(pads=pads)
+        if geometry.N != len(pads.pads):
+            raise ValueError("geometry does not match the number of pads")
+        self.sensor = pads
+        self.pads = pads.pads
+        self.geometry = geometry
         # range of touch pads
         if pad_max is None or pad_min is None:
-            start_time = monotonic()
-            pad_max = [0] * 5
-            pad_min = [100000] * 5
-            while monotonic() - start_time < 5:
-                # run the test for 5s
-                # in the mean time, slide on the ring for multiple cycles.
-                for i in range(5):
-                    value = self.pads[i].raw_value
-                    pad_max[i] = max(pad_max[i], value)
-                    pad_min[i] = min(pad_min[i], value)
-                    # print(ring_max, ring_min)
-                    sleep(0.1)
+            # run the test for 5s
+            # in the mean time, slide on the ring for multiple cycles.
+            pad_max, pad_min = self.sensor.measure_range(5)
             print("pad_max =", pad_max, ",")
             print("pad_min =", pad_min)
             # cancel running the original script
@@ -217,47 +541,246 @@ class TouchWheelPhysics:
         else:
             self.pad_max, self.pad_min = pad_max, pad_min
         # direction constants
-        self.alter_x = [0, 0, -1, 1, 0]
-        self.alter_y = [1, -1, 0, 0, 0]
-        self.alter_z = [1, 1, 1, 1, 1]
+        self.coef, offset = self.geometry.projection(self.pad_max, self.pad_min)
+        self.x0, self.y0, self.z0 = offset
+        # ring pads for the fine angle estimator
+        self.fine_angle = fine_angle
+        self.raw = self.sensor.raw
+        self.ring_index = self.geometry.ring
+        self.ring_angle = [
+            self.geometry.pads[i][0] / 180 * pi for i in self.ring_index
+        ]
+        self.ring_scale = [
+            1 / (self.pad_max[i] - self.pad_min[i]) for i in self.ring_index
+        ]
 
         # states
         self.filter_level = 1  # not more than 2
         self.relay_thr = 0.5
-        self.x = State(filter_level=self.filter_level, relay_thr=self.relay_thr)
-        self.y = State(filter_level=self.filter_level, relay_thr=self.relay_thr)
-        self.z = State(filter_level=self.filter_level, relay_thr=self.relay_thr)
+        if make_filter is None:
+            make_filter = lambda: LowPass(self.filter_level)
+        self.x = State(filter=make_filter(), relay_thr=self.relay_thr)
+        self.y = State(filter=make_filter(), relay_thr=self.relay_thr)
+        self.z = State(filter=make_filter(), relay_thr=self.relay_thr)
 
         self.r = State()  # amplitude on the plane
         self.l = State()  # amplitude in the space
         self.theta = State()  # angle on the plane
         self.phi = State()  # angle raised
+        self.theta_fine = State()  # interpolated angle on the plane
+        self.theta_d = 0  # change of angle since the last sample
+        self.out = Sample()
+
+    def ring_weight(self, k):
+        """
+        normalized weight of the k-th pad on the ring
+        """
+        i = self.ring_index[k]
+        return (self.raw[i] - self.pad_min[i]) * self.ring_scale[k]
+
+    def interpolate_theta(self):
+        """
+        Estimate the finger angle from the strongest ring pad and its neighbours.
+        The offset from the strongest pad is the ratio of the neighbour weights
+        after removing the common baseline,
+        so resolution is not limited by the pad count.
+        """
+        n = len(self.ring_index)
+        k = 0
+        w_k = self.ring_weight(0)
+        for i in range(1, n):
+            w = self.ring_weight(i)
+            if w > w_k:
+                k, w_k = i, w
+        w_prev = self.ring_weight(k - 1)
+        w_next = self.ring_weight((k + 1) % n)
+        span = w_k + w_prev + w_next - 3 * min(w_prev, w_next)
+        if span <= 0:
+            # no finger on the ring, hold the last estimate
+            return self.theta_fine.now
+        delta = max(-0.5, min(0.5, (w_next - w_prev) / span))
+        # pad spacing on each side
+        angle = self.ring_angle[k]
+        if delta > 0:
+            spacing = theta_diff(self.ring_angle[(k + 1) % n], angle)
+        else:
+            spacing = theta_diff(angle, self.ring_angle[k - 1])
+        return theta_diff(angle + delta * spacing, 0)
+
+    def touch_z(self):
+        """
+        unfiltered z only, without updating any state
+        a cheap touch check while the loop is idle
+        """
+        coef = self.coef
+        z = -self.z0
+        for i in range(len(self.pads)):
+            z += self.pads[i].raw_value * coef[3 * i + 2]
+        return z
 
     def get(self):
-        # read sensor
-        pads_now = [r.raw_value for r in self.pads]
-        # conver sensor to weights
-        w = [
-            (pads_now[i] - self.pad_min[i]) / (self.pad_max[i] - self.pad_min[i])
-            for i in range(5)
-        ]
-        # computer vector sum
-        self.x.now = sum([w[i] * self.alter_x[i] for i in range(5)])
-        self.y.now = sum([w[i] * self.alter_y[i] for i in range(5)])
-        self.z.now = sum([w[i] * self.alter_z[i] for i in range(5)])
+        # read sensor, self.raw is filled by the read
+        coef = self.coef
+        x = -self.x0
+        y = -self.y0
+        z = -self.z0
+        j = 0
+        for value in self.sensor.read():
+            # vector sum
+            x += value * coef[j]
+            y += value * coef[j + 1]
+            z += value * coef[j + 2]
+            j += 3
+        self.x.now = x
+        self.y.now = y
+        self.z.now = z
         # conver to polar axis
         self.r.now = sqrt(self.x.now**2 + self.y.now**2)
         self.theta.now = atan2(self.y.now, self.x.now)
+        if self.fine_angle:
+            self.theta_fine.now = self.interpolate_theta()
+        else:
+            self.theta_fine.now = self.theta.now
+        self.theta_d = theta_diff(self.theta_fine.now, self.theta_fine.last)
+
+        out = self.out
+        out.x = self.x.now
+        out.y = self.y.now
+        out.z = self.z.now
+        out.r = self.r.now
+        out.theta = self.theta.now
+        out.theta_fine = self.theta_fine.now
+        out.theta_d = self.theta_d
+        return out
 
-        return Dict2Obj(
-            {
-                "x": self.x.now,
-                "y": self.y.now,
-                "z": self.z.now,
-                "r": self.r.now,
-                "theta": self.theta.now,
-            }
-        )
+
+# buttons of WheelEventEngine, in the order their events are emitted
+BUTTONS = ("center", "up", "down", "left", "right")
+# button of each SectorClassifier(4) sector: right, up, left, down
+SECTOR_BUTTONS = (4, 1, 3, 2)
+
+
+class WheelFrame:
+    """
+    Output record of WheelEventEngine, updated in place every frame
+    press, release, long: index in BUTTONS, -1 for none
+    dial: dial steps, 0 for none
+    scroll: items of smooth scroll, 0 for none
+    """
+
+    def __init__(self):
+        self.press = -1
+        self.release = -1
+        self.long = -1
+        self.dial = 0
+        self.scroll = 0
+
+
+class WheelEventEngine:
+    """
+    Streaming state machine of the wheel events
+    shared by TouchWheelNavigationEvents and driver.Ring
+    update() takes the touch of one frame and fills self.frame,
+    nothing is allocated per frame
+    dial: Dial
+    smooth, friction, min_speed, scroll_thr: see TouchWheelNavigationEvents
+    scroll_scale: items per rad of theta_d
+    """
+
+    def __init__(
+        self,
+        dial,
+        smooth=False,
+        friction=0.04,
+        min_speed=0.6,
+        scroll_scale=1,
+        scroll_thr=pi / 60,
+    ):
+        self.any = State(id="any")
+        self.ring = State()
+        self.button = -1
+        self.dial = dial
+        self.hold_timer = Timer()
+        self.smooth = smooth
+        self.friction = friction
+        self.min_speed = min_speed
+        self.scroll_scale = scroll_scale
+        # jitter of a still finger stays below the relay threshold
+        self.scroll_relay = Relay(scroll_thr)
+        self.scroll_speed = 0  # items per second
+        self.last_time = monotonic()
+        self.frame = WheelFrame()
+
+    def update(self, any, ring, button, theta, theta_d=0):
+        """
+        any: 1 when the wheel is touched
+        ring: 1 when the ring is touched
+        button: index in BUTTONS of the touched button, -1 for none
+        theta: angle of the touch, theta_d: its change for smooth scroll
+        """
+        frame = self.frame
+        frame.press = -1
+        frame.release = -1
+        frame.long = -1
+        frame.dial = 0
+        frame.scroll = 0
+        self.any.now = any
+        self.ring.now = ring
+        last = self.button
+        self.button = button
+        any_diff = self.any.diff
+        # buttons
+        if not self.dial.changed:
+            if any_diff == 1:
+                frame.press = button
+            if any_diff == -1:
+                frame.release = last
+        # dial
+        if self.ring.diff == 1:
+            self.dial.reset(theta)
+        if ring == 1:
+            dial = self.dial.update(theta)
+            if not self.smooth:
+                frame.dial = dial
+        if self.smooth:
+            self.scroll(theta_d)
+        # long press
+        if any_diff == 1:
+            self.hold_timer.start(1)
+        if any == 1 and self.hold_timer.over() and not self.dial.changed:
+            self.dial.changed = True
+            frame.long = button
+        if any_diff == -1:
+            self.dial.changed = False
+        return frame
+
+    def scroll(self, theta_d):
+        """
+        smooth scroll with momentum
+        the speed is kept in items per second, so the momentum does not
+        depend on the frame rate
+        """
+        now = monotonic()
+        dt = now - self.last_time
+        self.last_time = now
+        if self.ring.now == 1:
+            if self.ring.diff == 1:
+                self.scroll_relay.remain = 0
+                self.scroll_speed = 0
+                return
+            items = self.scroll_relay(theta_d) * self.scroll_scale
+            if dt > 0:
+                self.scroll_speed = (self.scroll_speed + items / dt) / 2
+            if items:
+                self.frame.scroll = items
+        elif self.any.now == 1:
+            # touching the center stops the wheel
+            self.scroll_speed = 0
+        elif abs(self.scroll_speed) > self.min_speed:
+            self.scroll_speed *= self.friction**dt
+            self.frame.scroll = self.scroll_speed * dt
+        else:
+            self.scroll_speed = 0
 
 
 class TouchWheelNavigationEvents:
@@ -269,7 +792,21 @@ class TouchWheelNavigationEvents:
         thr_lower=0.9,
         thr_r=0.3,
         thr_deg=45,
+        smooth=False,
+        friction=0.04,
+        min_speed=0.6,
+        accel=None,
+        scroll_thr=pi / 60,
     ):
+        """
+        smooth: emit "scroll" events with fractional number of items
+            instead of "dial" events, keep scrolling after release
+            with momentum, friction is the fraction of the speed kept
+            after one second, until slower than min_speed items per second
+        scroll_thr: rad, angle changes pass through a Relay of this
+            threshold before scrolling, like the residual of the dial
+        accel: DialAcceleration, faster spins give larger dial values
+        """
         self.wheel = wheel
 
         self.thr_upper = thr_upper
@@ -277,17 +814,20 @@ class TouchWheelNavigationEvents:
         self.thr = self.thr_upper
         self.thr_r = thr_r
         self.thr_rad = thr_deg / 180 * pi
-
-        self.any = State(id="any")
-        self.ring = State()
-        self.up = State(id="up")
-        self.down = State(id="down")
-        self.left = State(id="left")
-        self.right = State(id="right")
-        self.center = State(id="center")
-
-        self.dial = Dial(N)
-        self.hold_timer = Timer()
+        # right, up, left, down
+        self.sectors = SectorClassifier(4, width=2 * self.thr_rad)
+
+        self.dial = Dial(N, accel=accel)
+        self.engine = WheelEventEngine(
+            self.dial,
+            smooth=smooth,
+            friction=friction,
+            min_speed=min_speed,
+            scroll_scale=-N / (2 * pi),  # items per rad
+            scroll_thr=scroll_thr,
+        )
+        self.any = self.engine.any
+        self.ring = self.engine.ring
 
         self.events = EventQueue()
 
@@ -295,61 +835,38 @@ class TouchWheelNavigationEvents:
         # get physical value
         self.phy = self.wheel.get()
         # touch detect
-        self.any.now = int(self.phy.z > self.thr)
-        self.ring.now = int(self.phy.r > self.thr_r) & self.any.now
-        self.center.now = int(self.phy.r < self.thr_r) & self.any.now
-        self.up.now = (
-            int(abs(theta_diff(pi / 2, self.phy.theta)) < self.thr_rad) & self.ring.now
-        )
-        self.down.now = (
-            int(abs(theta_diff(-pi / 2, self.phy.theta)) < self.thr_rad) & self.ring.now
-        )
-        self.left.now = (
-            int(abs(theta_diff(pi, self.phy.theta)) < self.thr_rad) & self.ring.now
-        )
-        self.right.now = (
-            int(abs(theta_diff(0, self.phy.theta)) < self.thr_rad) & self.ring.now
-        )
+        any = int(self.phy.z > self.thr)
+        ring = int(self.phy.r > self.thr_r) & any
+        button = -1
+        if any and self.phy.r < self.thr_r:
+            button = 0  # center
+        elif ring:
+            sector = self.sectors.classify(self.phy.x, self.phy.y)
+            if sector >= 0:
+                button = SECTOR_BUTTONS[sector]
+        frame = self.engine.update(any, ring, button, self.phy.theta, self.phy.theta_d)
         # adaptive threshold
         if self.any.diff == 1:
             self.thr = self.thr_lower
         if self.any.diff == -1:
             self.thr = self.thr_upper
-        # buttons
-        for state in [
-            self.center,
-            self.up,
-            self.down,
-            self.left,
-            self.right,
-        ]:
-            if not self.dial.changed:
-                if state.diff == 1 and self.any.diff == 1:
-                    self.events.append(Event(name="press", val=state.id))
-                if state.diff == -1 and self.any.diff == -1:
-                    self.events.append(Event(name="release", val=state.id))
-        # dial
-        if self.ring.diff == 1:
-            self.dial.reset(self.phy.theta)
-        if self.ring.now == 1:
-            dial = self.dial.update(self.phy.theta)
-            if dial:
-                self.events.append(Event(name="dial", val=dial))
-        # long press
-        if self.any.diff == 1:
-            self.hold_timer.start(1)
-        if self.any.now == 1 and self.hold_timer.over() and not self.dial.changed:
-            self.dial.changed = True
-            for state in [
-                self.center,
-                self.up,
-                self.down,
-                self.left,
-                self.right,
-            ]:
-                if state.now == 1:
-                    self.events.append(Event(name="long", val=state.id))
-        if self.any.diff == -1:
-            self.dial.changed = False
+        # events
+        if frame.press >= 0:
+            self.events.append(Event(name="press", val=BUTTONS[frame.press]))
+        if frame.release >= 0:
+            self.events.append(Event(name="release", val=BUTTONS[frame.release]))
+        if frame.dial:
+            self.events.append(Event(name="dial", val=frame.dial))
+        if frame.scroll:
+            self.push_scroll(frame.scroll)
+        if frame.long >= 0:
+            self.events.append(Event(name="long", val=BUTTONS[frame.long]))
 
         return self.events.get()
+
+    def push_scroll(self, val):
+        # merge with a scroll event not yet taken from the queue
+        if self.events and self.events.data[-1].name == "scroll":
+            self.events.data[-1].val += val
+        else:
+            self.events.append(Event(name="scroll", val=val))
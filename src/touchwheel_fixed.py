@@ -0,0 +1,310 @@
+# %% clickwheel, fixed point
+"""
+Integer version of TouchWheelPhysics and TouchWheelNavigationEvents
+for boards without an FPU, where every float operation is emulated
+and may allocate.
+
+Units
+- Q15: 1.0 is ONE = 32768, used for x, y, z and r
+- binary angle: a full turn is TURN = 65536, used for theta
+    0 at +x, counter-clockwise, in range [-HALF_TURN, HALF_TURN)
+
+Intermediate values are kept below 2**30,
+so they stay small ints on 32-bit MicroPython ports.
+"""
+from math import atan, pi
+from touchwheel import (
+    State,
+    SectorClassifier,
+    TouchWheelNavigationEvents,
+    Sample,
+    FIVE_PAD,
+)
+
+ONE = 1 << 15
+TURN = 1 << 16
+HALF_TURN = 1 << 15
+
+# atan on [0, 1] in binary angle, ATAN_SIZE segments, linearly interpolated
+ATAN_BITS = 5
+ATAN_SIZE = 1 << ATAN_BITS
+ATAN_TABLE = [
+    round(atan(i / ATAN_SIZE) / (2 * pi) * TURN) for i in range(ATAN_SIZE + 1)
+]
+RATIO_BITS = 12
+
+
+def atan2_int(y, x):
+    """
+    atan2 in binary angle by octant reduction and table lookup
+    error is within 5 binary angle units (0.03 degree)
+    """
+    if x == 0 and y == 0:
+        return 0
+    ax = -x if x < 0 else x
+    ay = -y if y < 0 else y
+    # angle in the first octant
+    if ay <= ax:
+        ratio = (ay << RATIO_BITS) // ax
+    else:
+        ratio = (ax << RATIO_BITS) // ay
+    i = ratio >> (RATIO_BITS - ATAN_BITS)
+    frac = ratio & ((1 << (RATIO_BITS - ATAN_BITS)) - 1)
+    a = ATAN_TABLE[i]
+    if frac:
+        a += ((ATAN_TABLE[i + 1] - a) * frac) >> (RATIO_BITS - ATAN_BITS)
+    # back to the full circle
+    if ay > ax:
+        a = (TURN >> 2) - a
+    if x < 0:
+        a = HALF_TURN - a
+    if y < 0:
+        a = -a
+    if a >= HALF_TURN:
+        a -= TURN
+    return a
+
+
+def isqrt(n):
+    """
+    integer square root, floor(sqrt(n)) for n >= 0
+    """
+    if n <= 0:
+        return 0
+    x = n
+    y = (x + 1) >> 1
+    while y < x:
+        x = y
+        y = (x + n // x) >> 1
+    return x
+
+
+def angle_diff_int(a, b):
+    """
+    theta_diff in binary angle
+    """
+    return ((a - b + HALF_TURN) & (TURN - 1)) - HALF_TURN
+
+
+class RelayInt:
+    """
+    Relay in Q15
+    """
+
+    def __init__(self, thr):
+        self.thr = thr
+        self.remain = 0
+
+    def __call__(self, x):
+        self.remain += x
+        if self.remain > self.thr:
+            y = self.remain - self.thr
+        elif self.remain < -self.thr:
+            y = self.remain + self.thr
+        else:
+            self.remain = (self.remain * 31130) >> 15  # * 0.95
+            y = 0
+        self.remain = self.remain - y
+        return y
+
+
+class StateInt(State):
+    """
+    State with an integer low pass filter, alpha = 1 / 2**filter_level,
+    and an integer relay
+    """
+
+    def __init__(self, filter_level=None, relay_thr=None, id=None):
+        super().__init__(id=id)
+        self.filter_level = filter_level
+        self.use_filter = filter_level is not None
+        self.use_relay = relay_thr is not None
+        if self.use_relay:
+            self.relay = RelayInt(relay_thr)
+
+    @property
+    def now(self):
+        return self._now
+
+    @now.setter
+    def now(self, new):
+        self.last = self._now
+        # low pass filter
+        if self.use_filter:
+            new = self._now + ((new - self._now) >> self.filter_level)
+        # Relay
+        diff = new - self.last
+        new = self.last + (self.relay(diff) if self.use_relay else diff)
+        self._now = new
+
+
+class SectorClassifierInt(SectorClassifier):
+    """
+    SectorClassifier on integer x and y
+    pseudo angles are scaled by ONE
+    """
+
+    def boundary(self, theta):
+        return round(super().boundary(theta) * ONE)
+
+    def angle(self, x, y):
+        # the pseudo angle does not depend on the length,
+        # halve (x, y) to below ONE so the shifts stay below 2**30,
+        # x and y reach 2**17 with pads beyond pad_max
+        while x >= ONE or x <= -ONE or y >= ONE or y <= -ONE:
+            x >>= 1
+            y >>= 1
+        if y >= 0:
+            if x >= 0:
+                s = x + y
+                return (y << 15) // s if s else 0
+            return ONE + ((-x) << 15) // (y - x)
+        if x < 0:
+            return 2 * ONE + ((-y) << 15) // (-x - y)
+        return 3 * ONE + (x << 15) // (x - y)
+
+
+class DialInt:
+    """
+    Dial in binary angle
+    the residual is kept multiplied by N, so steps of TURN / N are exact
+    """
+
+    def __init__(self, N):
+        self.N = N
+        self.changed = False
+
+    def reset(self, theta):
+        self.theta_residual = 0
+        self.theta_d = 0
+        self.theta_last = theta
+        self.changed = False
+
+    def update(self, theta):
+        self.theta_d = angle_diff_int(theta, self.theta_last)
+        self.theta_residual += self.theta_d * self.N
+        dial = 0
+        while self.theta_residual > HALF_TURN:
+            self.theta_residual -= TURN
+            dial -= 1
+        while self.theta_residual < -HALF_TURN:
+            self.theta_residual += TURN
+            dial += 1
+        if dial:
+            self.changed = True
+        self.theta_last = theta
+        return dial
+
+
+class TouchWheelPhysicsInt:
+    """
+    TouchWheelPhysics in integers
+    x, y, z, r in Q15, theta in binary angle
+    pad_max and pad_min are required
+    """
+
+    def __init__(
+        self,
+        up=None,
+        down=None,
+        left=None,
+        right=None,
+        center=None,
+        pad_max=None,
+        pad_min=None,
+        pads=None,
+        geometry=None,
+    ):
+        if pads is None:
+            pads = [up, down, left, right, center]
+            if geometry is None:
+                geometry = FIVE_PAD
+        elif geometry is None:
+            raise ValueError("geometry is required with pads, e.g. ring_geometry(4)")
+        if geometry.N != len(pads):
+            raise ValueError("geometry does not match the number of pads")
+        self.pads = pads
+        self.geometry = geometry
+        self.pad_max, self.pad_min = pad_max, pad_min
+        n = len(pads)
+        # Q15 coefficients on (raw_value - pad_min), scaled up by 2**shift
+        coef, offset = geometry.projection(pad_max, pad_min)
+        # raw values are clamped to 4 times the range above pad_min
+        self.limit = [4 * (pad_max[i] - pad_min[i]) for i in range(n)]
+        largest = max([abs(c) for c in coef]) * ONE * max(self.limit)
+        self.shift = 0
+        while self.shift < 16 and largest * 2 ** (self.shift + 1) < 2**29:
+            self.shift += 1
+        self.coef = [round(c * ONE * 2**self.shift) for c in coef]
+
+        # states
+        self.filter_level = 1  # not more than 2
+        self.relay_thr = ONE // 2
+        self.x = StateInt(filter_level=self.filter_level, relay_thr=self.relay_thr)
+        self.y = StateInt(filter_level=self.filter_level, relay_thr=self.relay_thr)
+        self.z = StateInt(filter_level=self.filter_level, relay_thr=self.relay_thr)
+        self.r = 0
+        self.theta = 0
+        self.out = Sample()
+
+    def get(self):
+        coef = self.coef
+        shift = self.shift
+        x = 0
+        y = 0
+        z = 0
+        j = 0
+        for i in range(len(self.pads)):
+            d = self.pads[i].raw_value - self.pad_min[i]
+            if d > self.limit[i]:
+                d = self.limit[i]
+            elif d < -self.limit[i]:
+                d = -self.limit[i]
+            x += (d * coef[j]) >> shift
+            y += (d * coef[j + 1]) >> shift
+            z += (d * coef[j + 2]) >> shift
+            j += 3
+        self.x.now = x
+        self.y.now = y
+        self.z.now = z
+        # polar axis, squares taken in Q11 to stay in small ints
+        x = self.x.now >> 4
+        y = self.y.now >> 4
+        self.r = isqrt(x * x + y * y) << 4
+        self.theta = atan2_int(self.y.now, self.x.now)
+
+        out = self.out
+        out.x = self.x.now
+        out.y = self.y.now
+        out.z = self.z.now
+        out.r = self.r
+        out.theta = self.theta
+        return out
+
+
+class TouchWheelNavigationEventsInt(TouchWheelNavigationEvents):
+    """
+    TouchWheelNavigationEvents on TouchWheelPhysicsInt
+    thresholds are given in the same float units as the float version
+    smooth scroll and dial acceleration are not supported
+    """
+
+    def __init__(
+        self,
+        wheel,
+        N=8,
+        thr_upper=1.0,
+        thr_lower=0.9,
+        thr_r=0.3,
+        thr_deg=45,
+    ):
+        super().__init__(
+            wheel,
+            N=N,
+            thr_upper=int(thr_upper * ONE),
+            thr_lower=int(thr_lower * ONE),
+            thr_r=int(thr_r * ONE),
+            thr_deg=thr_deg,
+        )
+        self.sectors = SectorClassifierInt(4, width=2 * self.thr_rad)
+        self.dial = self.engine.dial = DialInt(N)
@@ -0,0 +1,76 @@
+"""
+Simulated touch wheel for running the touchwheel classes off the board
+used by the speed and parity tests
+
+FakePad mimics touchio.TouchIn.raw_value
+SimulatedWheel sets the pads from a finger position
+"""
+from math import pi
+from touchwheel import theta_diff, FIVE_PAD
+
+# measured on the 5 pad board, see password.py
+PAD_MAX = [2160, 2345, 2160, 1896, 2602]
+PAD_MIN = [904, 1239, 862, 879, 910]
+
+
+class FakePad:
+    def __init__(self, raw_value=0):
+        self.raw_value = raw_value
+
+
+class SimulatedWheel:
+    """
+    pads respond linearly to the angular distance of the finger,
+    reaching the baseline at the neighbouring pad
+    """
+
+    def __init__(self, geometry=FIVE_PAD, pad_max=PAD_MAX, pad_min=PAD_MIN):
+        self.geometry = geometry
+        self.pad_max = pad_max
+        self.pad_min = pad_min
+        self.pads = [FakePad(pad_min[i]) for i in range(geometry.N)]
+        self.spacing = 2 * pi / len(geometry.ring)
+
+    def touch(self, theta=None, r=1, noise=0):
+        """
+        theta: finger angle in rad, None for no touch
+        r: 1 on the ring, 0 on the center pad
+        noise: a number in [-1, 1] added to all weights, scaled by 0.01
+        """
+        for i in range(self.geometry.N):
+            angle, radius, weight = self.geometry.pads[i]
+            if theta is None:
+                w = 0
+            elif radius == 0:
+                w = 1 - r
+            else:
+                d = abs(theta_diff(theta, angle / 180 * pi))
+                w = max(0, 1 - d / self.spacing) * r
+            w = min(1, w + 0.1 * (theta is not None) + 0.01 * noise)
+            self.pads[i].raw_value = int(
+                self.pad_min[i] + w * (self.pad_max[i] - self.pad_min[i])
+            )
+
+
+def demo_trace(frames=600):
+    """
+    list of (theta, r) finger positions, one for each frame
+    taps on each direction, a slow and a fast spin and a center tap
+    """
+    trace = []
+    for theta in [pi / 2, -pi / 2, pi, 0]:
+        trace += [(theta, 1)] * 10 + [(None, 1)] * 10
+    for speed in [0.03, 0.15, -0.08]:
+        theta = 0.3
+        for i in range(80):
+            trace.append((theta, 1))
+            theta = theta_diff(theta + speed, 0)
+        trace += [(None, 1)] * 10
+    trace += [(0, 0)] * 10 + [(None, 1)] * 10
+    noise = 0
+    out = []
+    while len(out) < frames:
+        for theta, r in trace:
+            noise = (noise * 75 + 74) % 65537  # deterministic jitter
+            out.append((theta, r, noise / 32768 - 1))
+    return out[:frames]